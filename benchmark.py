@@ -0,0 +1,360 @@
+"""
+Offline benchmarks for the scrapers.
+
+Fixtures are plain files recorded from the live site (see the ``record`` command):
+    <fixtures>/offers/<name>.html      offer page, optional <name>.json with its job_meta
+    <fixtures>/listings/page-<n>.html  archive listing pages 1..N of one month
+    <fixtures>/pdfs/<name>.pdf         course cards for scrap.py
+
+benchmarks/fixtures (the default) holds a small sanitized set - made-up companies, offers and
+course cards with the live layout - so every benchmark runs out of the box.
+
+The ``details`` and ``links`` benchmarks run the real fetch code against a local stand-in
+server that replays the fixtures, so results do not depend on the live site.
+
+Usage:
+    python benchmark.py parity  --fixtures benchmarks/fixtures   # also enforced by tests/test_parser_parity.py
+    python benchmark.py parsers --fixtures benchmarks/fixtures --rounds 5
+    python benchmark.py details --fixtures benchmarks/fixtures --backend pipeline --repeat 50
+    python benchmark.py links   --fixtures benchmarks/fixtures
+    python benchmark.py pdfs    --fixtures benchmarks/fixtures
+    python benchmark.py record  --fixtures benchmarks/fixtures --links-file links.json --limit 200
+    python benchmark.py record  --fixtures benchmarks/fixtures --cards-dir karty_przedmiotow --limit 20
+    python benchmark.py details --baseline benchmarks/baseline.json   # fails on a >20% slowdown
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).parent / "pracuj_pl_scrapper"))
+
+from details_extractor import collect_job_details_from_links, fetch_html, parse_job_details  # noqa: E402
+from link_extractor import collect_links, listing_url  # noqa: E402
+from metrics import HTTP_REQUEST, METRICS  # noqa: E402
+from rate_limiter import RATE_CONTROLLER  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PARSER_BACKENDS = ["bs4", "lxml"]
+FETCH_BACKENDS = ["threads", "pipeline", "asyncio"]
+LISTING_PAGE_RE = re.compile(r"page-(\d+)\.html$")
+EMPTY_LISTING = "<html><body><div class=\"offers\"></div></body></html>"
+
+
+def load_offer_fixtures(fixtures_dir):
+    offers = []
+    for html_file in sorted((Path(fixtures_dir) / "offers").glob("*.html")):
+        meta_file = html_file.with_suffix(".json")
+        if meta_file.exists():
+            job_meta = json.loads(meta_file.read_text(encoding="utf-8"))
+        else:
+            job_meta = {"link": html_file.stem}
+        offers.append((html_file.name, html_file.read_text(encoding="utf-8"), job_meta))
+    return offers
+
+
+def load_listing_fixtures(fixtures_dir):
+    """Recorded listing pages of one month, in page order."""
+    pages = {}
+    for html_file in (Path(fixtures_dir) / "listings").glob("page-*.html"):
+        pages[int(LISTING_PAGE_RE.search(html_file.name).group(1))] = html_file.read_text(encoding="utf-8")
+    return [pages[n] for n in sorted(pages)]
+
+
+def load_pdf_fixtures(fixtures_dir):
+    return sorted((Path(fixtures_dir) / "pdfs").glob("*.pdf"))
+
+
+def check_parity(offers, backends=PARSER_BACKENDS):
+    """Return the fixture names for which any backend disagrees with the first one."""
+    mismatches = []
+    for name, html, job_meta in offers:
+        reference = json.dumps(parse_job_details(html, job_meta, parser=backends[0]), ensure_ascii=False)
+        for backend in backends[1:]:
+            candidate = json.dumps(parse_job_details(html, job_meta, parser=backend), ensure_ascii=False)
+            if candidate != reference:
+                mismatches.append((name, backend))
+    return mismatches
+
+
+def bench_parsers(offers, rounds=3, backends=PARSER_BACKENDS):
+    """Single-process parse throughput; CPU time is used so the figure is offers/sec per core."""
+    results = {}
+    for backend in backends:
+        start = time.process_time()
+        for _ in range(rounds):
+            for _, html, job_meta in offers:
+                parse_job_details(html, job_meta, parser=backend)
+        elapsed = time.process_time() - start
+        results[backend] = (len(offers) * rounds) / elapsed if elapsed else float("inf")
+    return results
+
+
+class StandInServer:
+    """
+    Local HTTP server replaying fixtures: ``/offers/<i>`` serves offer fixture i (modulo their
+    number) and ``/archive/offers?PageNumber=<n>`` the recorded listing page n, or an empty
+    listing past the last one. ``latency`` adds a fixed delay to every answer.
+    """
+
+    def __init__(self, offers=(), listings=(), latency=0.0):
+        self.offers = [html.encode("utf-8") for _, html, _ in offers]
+        self.listings = [html.encode("utf-8") for html in listings]
+        self.latency = latency
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                body = server.answer(self.path)
+                if server.latency:
+                    time.sleep(server.latency)
+                self.send_response(200 if body is not None else 404)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body or b"")))
+                self.end_headers()
+                self.wfile.write(body or b"")
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def answer(self, path):
+        parts = urlsplit(path)
+        if parts.path.startswith("/offers/") and self.offers:
+            return self.offers[int(parts.path.rsplit("/", 1)[1]) % len(self.offers)]
+        if parts.path == "/archive/offers":
+            page = int(parse_qs(parts.query).get("PageNumber", ["1"])[0])
+            return self.listings[page - 1] if 0 < page <= len(self.listings) else EMPTY_LISTING.encode("utf-8")
+        return None
+
+    def __enter__(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def cpu_seconds():
+    """CPU time of this process and its finished children (process pools)."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process plus its largest child, or None where unsupported."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return rss / (1024 ** 2 if sys.platform == "darwin" else 1024)
+
+
+def latency_summary():
+    return {"p50_ms": (HTTP_REQUEST.quantile(0.5) or 0) * 1000, "p99_ms": (HTTP_REQUEST.quantile(0.99) or 0) * 1000}
+
+
+def bench_details(offers, backend="threads", parser="bs4", repeat=20, workers=20, latency=0.0):
+    """Fetch and extract ``len(offers) * repeat`` offer pages from the stand-in server."""
+    METRICS.reset()
+    with StandInServer(offers=offers, latency=latency) as server, tempfile.TemporaryDirectory() as work_dir:
+        links = [{"link": f"{server.base_url}/offers/{i}", "title": "", "date": ""}
+                 for i in range(len(offers) * repeat)]
+        links_file = os.path.join(work_dir, "links.json")
+        with open(links_file, "w", encoding="utf-8") as f:
+            json.dump(links, f)
+        kwargs = {"seed_url": server.base_url} if backend == "asyncio" else {}
+
+        cpu, wall = cpu_seconds(), time.perf_counter()
+        collect_job_details_from_links("bench", links_file, work_dir, max_workers=workers, backend=backend,
+                                       parser=parser, **kwargs)
+        cpu, wall = cpu_seconds() - cpu, time.perf_counter() - wall
+
+    return {
+        "pages": len(links),
+        "pages_per_sec": len(links) / wall,
+        "offers_per_sec_per_core": len(links) / cpu if cpu else float("inf"),
+        **latency_summary(),
+    }
+
+
+def bench_links(listings, page_workers=4, rounds=3, latency=0.0):
+    """Run ``collect_links`` for one month over the recorded listing pages ``rounds`` times."""
+    METRICS.reset()
+    with StandInServer(listings=listings, latency=latency) as server, tempfile.TemporaryDirectory() as work_dir:
+        wall = time.perf_counter()
+        for _ in range(rounds):
+            collect_links(2000, 1, work_dir, page_workers=page_workers, base_url=server.base_url)
+        wall = time.perf_counter() - wall
+    requests = sum(entry["value"] for entry in METRICS.snapshot()["metrics"]["pracuj_http_responses_total"]["values"])
+    return {"pages": requests, "pages_per_sec": requests / wall, **latency_summary()}
+
+
+def bench_pdfs(pdfs, rounds=3):
+    """Text extraction + parsing of course-card PDFs; CPU time, so cards/sec per core."""
+    from scrap import extract_text_from_pdf, parse_course_info
+
+    extract = parse = 0.0
+    for _ in range(rounds):
+        for pdf in pdfs:
+            start = time.process_time()
+            text = extract_text_from_pdf(pdf)
+            parsed = time.process_time()
+            parse_course_info(text)
+            extract += parsed - start
+            parse += time.process_time() - parsed
+    cards = len(pdfs) * rounds
+    return {
+        "pdfs": cards,
+        "pdfs_per_sec_per_core": cards / (extract + parse) if extract + parse else float("inf"),
+        "extract_ms": extract / cards * 1000,
+        "parse_ms": parse / cards * 1000,
+    }
+
+
+def record(fixtures_dir, links_file=None, limit=100, year=None, month=None, pages=5, cards_dir=None):
+    """
+    Record offer pages from a links file and/or the first listing pages of a month from the live site,
+    and/or copy course cards downloaded by download_pdf.py.
+    """
+    fixtures_dir = Path(fixtures_dir)
+    if links_file:
+        (fixtures_dir / "offers").mkdir(parents=True, exist_ok=True)
+        with open(links_file, "r", encoding="utf-8") as f:
+            links = json.load(f)[:limit]
+        for i, job_meta in enumerate(links):
+            html = fetch_html(job_meta["link"])
+            if html is None:
+                continue
+            (fixtures_dir / "offers" / f"offer-{i:04d}.html").write_text(html, encoding="utf-8")
+            (fixtures_dir / "offers" / f"offer-{i:04d}.json").write_text(
+                json.dumps(job_meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"💾 Recorded {len(links)} offer pages → {fixtures_dir / 'offers'}")
+    if year and month:
+        (fixtures_dir / "listings").mkdir(parents=True, exist_ok=True)
+        for page in range(1, pages + 1):
+            html = fetch_html(listing_url("https://archiwum.pracuj.pl", year, month, page))
+            if html is None:
+                break
+            (fixtures_dir / "listings" / f"page-{page}.html").write_text(html, encoding="utf-8")
+        print(f"💾 Recorded listing pages of {year}-{month} → {fixtures_dir / 'listings'}")
+    if cards_dir:
+        (fixtures_dir / "pdfs").mkdir(parents=True, exist_ok=True)
+        cards = sorted(Path(cards_dir).glob("*.pdf"))[:limit]
+        for pdf in cards:
+            shutil.copyfile(pdf, fixtures_dir / "pdfs" / pdf.name)
+        print(f"💾 Recorded {len(cards)} course cards → {fixtures_dir / 'pdfs'}")
+
+
+def compare_baseline(path, command, results, tolerance):
+    """Compare throughput figures with a stored baseline (created on first use); False on a regression."""
+    baseline = json.loads(Path(path).read_text(encoding="utf-8")) if Path(path).exists() else {}
+    previous = baseline.get(command)
+    ok = True
+    if previous:
+        for key, value in results.items():
+            if key.endswith("per_sec") or key.endswith("per_core"):
+                if key in previous and value < previous[key] * (1 - tolerance):
+                    print(f"❌ {command} {key}: {value:.1f} vs baseline {previous[key]:.1f}")
+                    ok = False
+    else:
+        baseline[command] = results
+        Path(path).write_text(json.dumps(baseline, indent=2), encoding="utf-8")
+        print(f"📌 Stored baseline for {command} in {path}")
+    return ok
+
+
+def print_results(results):
+    for key, value in results.items():
+        print(f"{key:>24}: {value:10.1f}" if isinstance(value, float) else f"{key:>24}: {value}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("command", choices=["parity", "parsers", "details", "links", "pdfs", "record"])
+    ap.add_argument("--fixtures", default=str(Path(__file__).parent / "benchmarks" / "fixtures"))
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--backend", choices=FETCH_BACKENDS, default="threads")
+    ap.add_argument("--parser", choices=PARSER_BACKENDS, default="bs4")
+    ap.add_argument("--repeat", type=int, default=20, help="details: requests per offer fixture")
+    ap.add_argument("--workers", type=int, default=20)
+    ap.add_argument("--latency", type=float, default=0.0, help="stand-in server delay per answer, seconds")
+    ap.add_argument("--baseline", help="JSON file with reference figures; fail on a slowdown past --tolerance")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    ap.add_argument("--links-file", help="record: links file whose offers are recorded")
+    ap.add_argument("--limit", type=int, default=100)
+    ap.add_argument("--year", type=int)
+    ap.add_argument("--month", type=int)
+    ap.add_argument("--pages", type=int, default=5)
+    ap.add_argument("--cards-dir", help="record: folder of course cards downloaded by download_pdf.py")
+    args = ap.parse_args(argv)
+
+    if args.command == "record":
+        record(args.fixtures, args.links_file, args.limit, args.year, args.month, args.pages, args.cards_dir)
+        return 0
+
+    # The stand-in server is local; the production rate limits would only measure the limiter.
+    RATE_CONTROLLER.configure(initial_rate=10000, max_rate=10000, burst=1000)
+
+    if args.command == "links":
+        listings = load_listing_fixtures(args.fixtures)
+        if not listings:
+            print(f"🚫 No listing fixtures in {args.fixtures}/listings")
+            return 1
+        results = bench_links(listings, rounds=args.rounds, latency=args.latency)
+    elif args.command == "pdfs":
+        pdfs = load_pdf_fixtures(args.fixtures)
+        if not pdfs:
+            print(f"🚫 No PDF fixtures in {args.fixtures}/pdfs")
+            return 1
+        results = bench_pdfs(pdfs, rounds=args.rounds)
+    else:
+        offers = load_offer_fixtures(args.fixtures)
+        if not offers:
+            print(f"🚫 No offer fixtures in {args.fixtures}/offers")
+            return 1
+
+        if args.command == "parity":
+            mismatches = check_parity(offers)
+            for name, backend in mismatches:
+                print(f"❌ {name}: {backend} differs from {PARSER_BACKENDS[0]}")
+            print(f"✅ {len(offers) - len({n for n, _ in mismatches})}/{len(offers)} fixtures identical")
+            return 1 if mismatches else 0
+
+        if args.command == "parsers":
+            results = {f"{backend}_offers_per_sec_per_core": rate
+                       for backend, rate in bench_parsers(offers, rounds=args.rounds).items()}
+        else:
+            results = bench_details(offers, backend=args.backend, parser=args.parser, repeat=args.repeat,
+                                    workers=args.workers, latency=args.latency)
+
+    rss = peak_rss_mb()
+    if rss is not None:
+        results["peak_rss_mb"] = rss
+    print_results(results)
+    if args.baseline:
+        key = f"{args.command}:{args.backend}:{args.parser}" if args.command == "details" else args.command
+        return 0 if compare_baseline(args.baseline, key, results, args.tolerance) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
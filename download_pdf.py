@@ -1,6 +1,12 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 from bs4 import BeautifulSoup
-import os
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 URLS = [
     "https://ects.pg.edu.pl/pl/courses/17326/subcourses/17329/subjects",
@@ -11,35 +17,147 @@ URLS = [
 
 BASE = "https://ects.pg.edu.pl"
 
-os.makedirs("karty_przedmiotow", exist_ok=True)
+OUTPUT_DIR = "karty_przedmiotow"
+WORKERS = 8
+TIMEOUT = (5, 60)  # (połączenie, odczyt) w sekundach
+CHUNK_SIZE = 64 * 1024
+ETAGS_FILE = ".etags.json"
+
+DOWNLOADED = "pobrano"
+UNCHANGED = "bez zmian"
+FAILED = "błąd"
+
+
+def make_session(workers=WORKERS):
+    """Sesja z pulą połączeń na ``workers`` wątków i ponawianiem błędów przejściowych."""
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("HEAD", "GET"))
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class ETagStore:
+    """ETag i rozmiar każdego pobranego pliku w ``.etags.json`` obok kart."""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, ETAGS_FILE)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._entries = {}
+
+    def get(self, filename):
+        with self._lock:
+            return self._entries.get(filename)
+
+    def set(self, filename, etag, size):
+        with self._lock:
+            self._entries[filename] = {"etag": etag, "size": size}
 
-# Zbiór unikalnych linków
-unique_pdf_urls = set()
+    def save(self):
+        with self._lock:
+            data = json.dumps(self._entries, ensure_ascii=False, indent=2, sort_keys=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
 
-# Zbieranie linków PDF z każdej strony
-for url in URLS:
+
+def pdf_links(session, url):
     print(f"Przetwarzam: {url}")
-    response = requests.get(url)
+    response = session.get(url, timeout=TIMEOUT)
     response.raise_for_status()
     soup = BeautifulSoup(response.text, "html.parser")
 
     links = soup.find_all("a", href=lambda href: href and href.endswith("card.pdf"))
+    return [link["href"] if link["href"].startswith("http") else BASE + link["href"] for link in links]
+
+
+def collect_pdf_urls(session, urls=URLS, workers=WORKERS):
+    """Unikalne linki do kart ze wszystkich stron z listą przedmiotów, pobieranych równolegle."""
+    unique_pdf_urls = set()
+    with ThreadPoolExecutor(max_workers=min(workers, len(urls)) or 1) as executor:
+        for links in executor.map(lambda url: pdf_links(session, url), urls):
+            unique_pdf_urls.update(links)
+    return sorted(unique_pdf_urls)
 
-    for link in links:
-        href = link["href"]
-        pdf_url = href if href.startswith("http") else BASE + href
-        unique_pdf_urls.add(pdf_url)
 
-print(f"Znaleziono {len(unique_pdf_urls)} unikalnych plików PDF.\n")
+def is_unchanged(session, pdf_url, filepath, known):
+    """
+    Czy plik na dysku odpowiada temu na serwerze: przy znanym ETagu rozstrzyga HEAD z If-None-Match
+    (304), bez niego - zgodność Content-Length z rozmiarem pliku. Zwraca (bez zmian, ETag serwera).
+    """
+    if not os.path.exists(filepath):
+        return False, None
+    size = os.path.getsize(filepath)
+    etag = known and known.get("size") == size and known.get("etag")
+    headers = {"If-None-Match": etag} if etag else {}
+    response = session.head(pdf_url, headers=headers, timeout=TIMEOUT, allow_redirects=True)
+    if response.status_code == 304:
+        return True, etag
+    server_etag = response.headers.get("ETag")
+    if not response.ok or (etag and server_etag not in (None, etag)):
+        return False, server_etag
+    length = response.headers.get("Content-Length")
+    return length is not None and int(length) == size, server_etag
 
-# Pobieranie PDF-ów
-for i, pdf_url in enumerate(unique_pdf_urls, 1):
+
+def download_pdf(session, pdf_url, output_dir, etags):
+    """Pobiera jedną kartę strumieniowo do pliku tymczasowego i podmienia go atomowo; zwraca (nazwa, status)."""
     filename = pdf_url.split("/")[-2] + ".pdf"
-    filepath = os.path.join("karty_przedmiotow", filename)
+    filepath = os.path.join(output_dir, filename)
+    try:
+        known = etags.get(filename)
+        unchanged, etag = is_unchanged(session, pdf_url, filepath, known)
+        if unchanged:
+            # Plik zgodny po rozmiarze - zapamiętany ETag pozwoli następnym razem pytać o 304.
+            if etag and not (known and known.get("etag")):
+                etags.set(filename, etag, os.path.getsize(filepath))
+            return filename, UNCHANGED
+
+        tmp = filepath + ".part"
+        with session.get(pdf_url, stream=True, timeout=TIMEOUT) as response:
+            response.raise_for_status()
+            with open(tmp, "wb") as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+            etag = response.headers.get("ETag")
+        os.replace(tmp, filepath)
+        etags.set(filename, etag, os.path.getsize(filepath))
+        return filename, DOWNLOADED
+    except (requests.RequestException, OSError) as e:
+        print(f"❌ {filename}: {e}")
+        return filename, FAILED
+
+
+def main(output_dir=OUTPUT_DIR, urls=URLS, workers=WORKERS):
+    os.makedirs(output_dir, exist_ok=True)
+    session = make_session(workers)
+    etags = ETagStore(output_dir)
+
+    pdf_urls = collect_pdf_urls(session, urls, workers)
+    print(f"Znaleziono {len(pdf_urls)} unikalnych plików PDF.\n")
+
+    counts = {DOWNLOADED: 0, UNCHANGED: 0, FAILED: 0}
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for filename, status in executor.map(lambda url: download_pdf(session, url, output_dir, etags), pdf_urls):
+                counts[status] += 1
+                if status == DOWNLOADED:
+                    print(f"Pobrano: {filename}")
+    finally:
+        etags.save()
+        session.close()
+
+    print(f"Wszystkie pliki zostały zapisane: {counts[DOWNLOADED]} pobranych, "
+          f"{counts[UNCHANGED]} bez zmian, {counts[FAILED]} błędów.")
+    return counts
 
-    print(f"Pobieram {i}: {filename}")
-    pdf_response = requests.get(pdf_url)
-    with open(filepath, "wb") as f:
-        f.write(pdf_response.content)
 
-print("Wszystkie pliki zostały zapisane.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import asyncio
+import random
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from details_extractor import DetailsCollector, parse_job_details
+from metrics import HTTP_CONNECT, HTTP_DNS, HTTP_RETRIES, HTTP_TTFB, observe_response
+from rate_limiter import RATE_CONTROLLER, THROTTLE_STATUSES
+from session_pool import SESSION_POOL, USER_AGENTS
+
+MAX_IN_FLIGHT = 200
+PER_HOST_LIMIT = 50
+REQUEST_TIMEOUT = 15
+SEED_URL = "https://archiwum.pracuj.pl"
+
+
+def cloudflare_session_state(seed_url=SEED_URL):
+    """Borrow a challenge-solved session from the pool and return its (headers, cookies)."""
+    with SESSION_POOL.session() as pooled:
+        try:
+            pooled.get(seed_url, timeout=REQUEST_TIMEOUT)
+            return dict(pooled.headers), pooled.cookies.get_dict()
+        except Exception as e:
+            print(f"⚠️ Could not seed session from {seed_url}: {e}")
+            return {"User-Agent": random.choice(USER_AGENTS), "Accept": "*/*"}, {}
+
+
+def trace_config():
+    """aiohttp tracing hooks feeding the DNS, connection setup and time-to-first-byte histograms."""
+    trace = aiohttp.TraceConfig()
+
+    def started(attr):
+        async def hook(session, ctx, params):
+            setattr(ctx, attr, time.perf_counter())
+        return hook
+
+    def finished(attr, histogram):
+        async def hook(session, ctx, params):
+            histogram.observe(time.perf_counter() - getattr(ctx, attr))
+        return hook
+
+    trace.on_dns_resolvehost_start.append(started("dns_start"))
+    trace.on_dns_resolvehost_end.append(finished("dns_start", HTTP_DNS))
+    trace.on_connection_create_start.append(started("connect_start"))
+    trace.on_connection_create_end.append(finished("connect_start", HTTP_CONNECT))
+    trace.on_request_start.append(started("request_start"))
+    # on_request_end fires once the response headers are in, i.e. at the first byte of the answer.
+    trace.on_request_end.append(finished("request_start", HTTP_TTFB))
+    return trace
+
+
+class AsyncFetcher:
+    """One shared aiohttp connection pool with a global in-flight limit and per-host caps."""
+
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, per_host=PER_HOST_LIMIT, host_limits=None,
+                 headers=None, cookies=None, max_retries=5, rate_controller=RATE_CONTROLLER, cache=None,
+                 archive=None):
+        self.max_in_flight = max_in_flight
+        self.per_host = per_host
+        self.host_limits = host_limits or {}
+        self.headers = headers or {"User-Agent": random.choice(USER_AGENTS), "Accept": "*/*"}
+        self.cookies = cookies or {}
+        self.max_retries = max_retries
+        self.rate_controller = rate_controller
+        self.cache = cache
+        self.archive = archive
+        self._session = None
+        self._in_flight = None
+        self._host_semaphores = {}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, limit_per_host=0, ttl_dns_cache=300)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            cookies=self.cookies,
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            trace_configs=[trace_config()],
+        )
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    def _host_semaphore(self, url):
+        host = urlsplit(url).hostname or ""
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.host_limits.get(host, self.per_host))
+        return self._host_semaphores[host]
+
+    async def fetch_text(self, url):
+        """Return the page body for ``url`` or None, with the same retry policy as ``get_soup``."""
+        cache = self.cache
+        if cache is not None and cache.offline:
+            return cache.get(url)
+
+        host_semaphore = self._host_semaphore(url)
+        headers = cache.conditional_headers(url) if cache is not None else {}
+        for attempt in range(self.max_retries):
+            try:
+                await self.rate_controller.acquire_async(url)
+                async with self._in_flight, host_semaphore:
+                    start = time.perf_counter()
+                    async with self._session.get(url, headers=headers) as resp:
+                        self.rate_controller.record(url, resp.status, resp.headers.get("Retry-After"))
+                        if resp.status == 200:
+                            body = await resp.text()
+                            observe_response(resp.status, total=time.perf_counter() - start,
+                                             body_bytes=resp.content_length or len(body.encode("utf-8")))
+                            if cache is not None:
+                                cache.store(url, body, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+                            if self.archive is not None:
+                                self.archive.write(url, body)
+                            return body
+                        status = resp.status
+                    observe_response(status, total=time.perf_counter() - start)
+                if status == 304 and cache is not None:
+                    body = cache.not_modified(url)
+                    if body is not None:
+                        return body
+                    HTTP_RETRIES.inc(status=304)
+                    headers = {}
+                    continue
+                if status not in THROTTLE_STATUSES:
+                    print(f"⚠️ Nieoczekiwany status {status} dla {url}")
+                    return None
+                HTTP_RETRIES.inc(status=status)
+            except Exception as e:
+                print(f"⚠️ Wyjątek przy pobieraniu {url}: {e}")
+                HTTP_RETRIES.inc(status="error")
+                await asyncio.sleep(2 + attempt)
+        return None
+
+
+async def collect_job_details_async(job_meta, fetcher, parser="bs4"):
+    html = await fetcher.fetch_text(job_meta["link"])
+    if html is None:
+        return None
+    # Parsing is CPU-bound, keep it off the event loop so sockets keep being serviced.
+    return await asyncio.to_thread(parse_job_details, html, job_meta, parser)
+
+
+async def _collect_all(collector, fetcher_kwargs, seed_url, parser):
+    if collector.cache is not None and collector.cache.offline:
+        headers, cookies = None, None
+    else:
+        headers, cookies = await asyncio.to_thread(cloudflare_session_state, seed_url)
+    jobs = iter(collector.todo)
+
+    async with AsyncFetcher(headers=headers, cookies=cookies, **collector.fetch_options, **fetcher_kwargs) as fetcher:
+        async def worker():
+            for job_meta in jobs:
+                try:
+                    collector.add(job_meta, await collect_job_details_async(job_meta, fetcher, parser))
+                except Exception as e:
+                    collector.error(job_meta, e)
+
+        await asyncio.gather(*(worker() for _ in range(min(fetcher.max_in_flight, collector.total) or 1)))
+
+
+def collect_job_details_from_links_async(year, links_file, output_dir, max_in_flight=MAX_IN_FLIGHT,
+                                         per_host=PER_HOST_LIMIT, host_limits=None, seed_url=SEED_URL, parser="bs4",
+                                         **collector_options):
+    """Asyncio counterpart of ``collect_job_details_from_links`` producing the same output file."""
+    collector = DetailsCollector(year, links_file, output_dir, **collector_options)
+
+    print(f"📅 Collecting {collector.total} offers for {year} (asyncio, {max_in_flight} in flight)...")
+
+    fetcher_kwargs = {"max_in_flight": max_in_flight, "per_host": per_host, "host_limits": host_limits}
+    asyncio.run(_collect_all(collector, fetcher_kwargs, seed_url, parser))
+
+    collector.finish()
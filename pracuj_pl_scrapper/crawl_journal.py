@@ -0,0 +1,125 @@
+import json
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+RETRY_AFTER = "retry_after"
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 15 * 60
+
+
+class CrawlJournal:
+    """
+    Persistent per-URL crawl status (pending / done / failed / retry_after) in SQLite,
+    so a restarted run skips finished offers and resumes where the previous one stopped.
+    """
+
+    def __init__(self, path, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                retry_after REAL,
+                payload TEXT,
+                updated_at REAL
+            )
+            """
+        )
+        # Completed URLs are kept in memory so the resume check is a set lookup.
+        self._done = {row[0] for row in self._conn.execute("SELECT url FROM urls WHERE status = ?", (DONE,))}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def is_done(self, url):
+        return url in self._done
+
+    def pending(self, links_data):
+        """Register ``links_data`` and return the entries that still have to be fetched now."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO urls (url, status, updated_at) VALUES (?, ?, ?)",
+                ((item["link"], PENDING, now) for item in links_data if item.get("link") not in self._done),
+            )
+            blocked = {
+                url for url, in self._conn.execute(
+                    "SELECT url FROM urls WHERE (status = ? AND retry_after > ?) OR (status = ? AND attempts >= ?)",
+                    (RETRY_AFTER, now, FAILED, self.max_attempts),
+                )
+            }
+        return [item for item in links_data if item.get("link") not in self._done and item.get("link") not in blocked]
+
+    def mark_done(self, url, payload=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO urls (url, status, attempts, payload, updated_at) VALUES (?, ?, 1, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET status = excluded.status, attempts = attempts + 1, "
+                "retry_after = NULL, payload = excluded.payload, updated_at = excluded.updated_at",
+                (url, DONE, json.dumps(payload, ensure_ascii=False) if payload is not None else None, time.time()),
+            )
+            self._done.add(url)
+
+    def mark_done_many(self, items):
+        """``mark_done`` for many ``(url, payload)`` pairs in one transaction."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO urls (url, status, attempts, payload, updated_at) VALUES (?, ?, 1, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET status = excluded.status, attempts = attempts + 1, "
+                "retry_after = NULL, payload = excluded.payload, updated_at = excluded.updated_at",
+                ((url, DONE, json.dumps(payload, ensure_ascii=False) if payload is not None else None, now)
+                 for url, payload in items),
+            )
+            self._conn.execute("COMMIT")
+            self._done.update(url for url, _ in items)
+
+    def mark_failed(self, url, retry_after=None):
+        """Record a failed fetch; with ``retry_after`` (seconds) the URL is parked until then."""
+        now = time.time()
+        status = RETRY_AFTER if retry_after is not None else FAILED
+        until = now + retry_after if retry_after is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO urls (url, status, attempts, retry_after, updated_at) VALUES (?, ?, 1, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET status = excluded.status, attempts = attempts + 1, "
+                "retry_after = excluded.retry_after, updated_at = excluded.updated_at",
+                (url, status, until, now),
+            )
+
+    def done_payloads(self, urls):
+        """Yield stored records for the completed URLs among ``urls``."""
+        wanted = [url for url in urls if url in self._done]
+        for i in range(0, len(wanted), 500):
+            chunk = wanted[i:i + 500]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT payload FROM urls WHERE payload IS NOT NULL AND url IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+            for payload, in rows:
+                yield json.loads(payload)
+
+    def counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM urls GROUP BY status").fetchall())
@@ -1,13 +1,25 @@
-import gc
+import itertools
 import json
 import os
-import random
+import queue
+import threading
 import time
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-import cloudscraper
-from bs4 import BeautifulSoup
+from glob import glob
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from bs4 import BeautifulSoup, Tag
+
+from crawl_journal import DONE, FAILED, RETRY_DELAY, CrawlJournal
+from html_archive import ArchiveReader, ArchiveWriter
+from http_cache import open_cache
+from json_merge import offer_id
+from json_stream import JsonArrayWriter, NdjsonSink, compact, iter_json_array, iter_ndjson, iter_records
+from metrics import HTTP_RETRIES, METRICS, OFFERS, QUEUE_DEPTH, WRITE_SECONDS, observe_parse, observe_response
+from offer_index import OfferIndex
+from rate_limiter import RATE_CONTROLLER, THROTTLE_STATUSES
+from session_pool import SESSION_POOL
+from work_queue import WorkQueue, drain, shard_of
 
 RESP_SECTION_MAP = {
     "section-requirements": "requirements",
@@ -41,112 +53,149 @@ RESP_SECTION_MAP = {
     "offered-1": "offered",
 }
 
-USER_AGENTS = [
-    (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/117.0.0.0 Safari/537.36"
-    ),
-    (
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-        "AppleWebKit/605.1.15 (KHTML, like Gecko) "
-        "Version/16.0 Safari/605.1.15"
-    ),
-    (
-        "Mozilla/5.0 (X11; Linux x86_64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/116.0.0.0 Safari/537.36"
-    ),
-    (
-        "Mozilla/5.0 (iPhone; CPU iPhone OS 16_4 like Mac OS X) "
-        "AppleWebKit/605.1.15 (KHTML, like Gecko) "
-        "Version/16.4 Mobile/15E148 Safari/604.1"
-    ),
-]
-
-
-def make_scraper():
-    scraper = cloudscraper.create_scraper()
-    scraper.headers.update(
-        {
-            "User-Agent": random.choice(USER_AGENTS),
-            "Accept": "*/*",
-            "Connection": "close",
-        }
-    )
-    return scraper
+FIELD_SELECTORS = {
+    "title": '[data-test="text-positionName"]',
+    "location": '[data-test="sections-benefit-workplaces"] [data-test="offer-badge-title"]',
+    "salary": '[data-test="text-earningAmount"]',
+    "work_type": '[data-test="sections-benefit-work-schedule"] [data-test="offer-badge-title"]',
+    "experience": '[data-test="sections-benefit-employment-type-name"] [data-test="offer-badge-title"]',
+    "contract_type": '[data-test="sections-benefit-contracts"] [data-test="offer-badge-title"]',
+    "operating_mode": '[data-scroll-id="work-modes"] [data-test="offer-badge-title"]',
+}
+
+COMPANY_SELECTOR = 'h2[data-scroll-id="employer-name"]'
+
+OUTPUT_FORMATS = ("ndjson", "json")
 
+LIST_ITEM_CLASSES = {"offer-view_tkzmjn3", "offer-view_catru5k"}
+LIST_ITEM_DATA_TEST_PREFIX = "item-technologies"
 
 def get_soup(url, scraper=None, max_retries=5):
-    local_scraper = scraper or make_scraper()
-    try:
-        for attempt in range(max_retries):
-            try:
-                resp = local_scraper.get(url, timeout=15)
-                if resp.status_code == 200:
-                    return BeautifulSoup(resp.text, "html.parser")
-                if resp.status_code in [429, 503]:
-                    time.sleep(random.uniform(0.8, 1.5))
-                else:
-                    print(f"⚠️ Nieoczekiwany status {resp.status_code} dla {url}")
-                    return None
-            except Exception as e:
-                print(f"⚠️ Wyjątek przy pobieraniu {url}: {e}")
-                time.sleep(2 + attempt)
+    html = fetch_html(url, scraper=scraper, max_retries=max_retries)
+    if html is None:
         return None
-    finally:
-        if scraper is None:
-            try:
-                local_scraper.close()
-            except Exception:
-                pass
+    return BeautifulSoup(html, "html.parser")
 
 
-def extract_classified_list_items(soup):
-    grouped_results = defaultdict(list)
-    try:
-        li_elements = soup.select(
-            "li.offer-view_tkzmjn3, "
-            "li.offer-view_catru5k, "
-            "li[data-test='item-technologies-os'], "
-            "li[data-test^='item-technologies']"
-        )
-    except Exception:
-        li_elements = []
-
-    for li in li_elements:
-        text = li.get_text(" ", strip=True)
-        section = "unknown"
+def fetch_html(url, scraper=None, max_retries=5, rate_controller=RATE_CONTROLLER, cache=None, archive=None):
+    if cache is not None and cache.offline:
+        return cache.get(url)
+    if scraper is None:
+        with SESSION_POOL.session() as pooled:
+            return fetch_html(url, pooled, max_retries, rate_controller, cache, archive)
 
+    headers = cache.conditional_headers(url) if cache is not None else {}
+    for attempt in range(max_retries):
         try:
-            if li.get("data-test") == "item-technologies-os":
-                mask = li.select_one("mask[id]")
-                if mask:
-                    mask_id = mask.get("id", "")
-                    if mask_id.startswith("gp_system_"):
-                        text = mask_id.replace("gp_system_", "")
-                        section = "technologies_os"
+            rate_controller.acquire(url)
+            start = time.perf_counter()
+            resp = scraper.get(url, timeout=15, headers=headers)
+            # requests sets ``elapsed`` once the headers are parsed, so it is the time to first byte.
+            observe_response(resp.status_code, resp.elapsed.total_seconds(), time.perf_counter() - start,
+                             len(resp.content))
+            rate_controller.record(url, resp.status_code, resp.headers.get("Retry-After"))
+            if resp.status_code == 200:
+                if cache is not None:
+                    cache.store(url, resp.text, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+                if archive is not None:
+                    archive.write(url, resp.text)
+                return resp.text
+            if resp.status_code == 304 and cache is not None:
+                body = cache.not_modified(url)
+                if body is not None:
+                    return body
+                HTTP_RETRIES.inc(status=304)
+                headers = {}
+                continue
+            if resp.status_code in THROTTLE_STATUSES:
+                # The controller has already paused this host; the next acquire() waits it out.
+                HTTP_RETRIES.inc(status=resp.status_code)
+                continue
             else:
-                parent = li.parent
-                while parent and parent.name != "[document]":
-                    scroll_id = parent.get("data-scroll-id", "").lower()
-                    if scroll_id in RESP_SECTION_MAP:
-                        section = RESP_SECTION_MAP[scroll_id]
-                        break
-                    parent = parent.parent
-        except Exception:
-            pass
+                print(f"⚠️ Nieoczekiwany status {resp.status_code} dla {url}")
+                return None
+        except Exception as e:
+            print(f"⚠️ Wyjątek przy pobieraniu {url}: {e}")
+            HTTP_RETRIES.inc(status="error")
+            time.sleep(2 + attempt)
+    return None
+
+
+def is_list_item(tag):
+    """Same match as the old "li.offer-view_tkzmjn3, li.offer-view_catru5k, li[data-test^='item-technologies']"."""
+    if tag.name != "li":
+        return False
+    if tag.get("data-test", "").startswith(LIST_ITEM_DATA_TEST_PREFIX):
+        return True
+    return not LIST_ITEM_CLASSES.isdisjoint(tag.get("class", ()))
+
+
+def classify_list_item(li, text, section):
+    if li.get("data-test") == "item-technologies-os":
+        section = "unknown"
+        mask = li.select_one("mask[id]")
+        if mask:
+            mask_id = mask.get("id", "")
+            if mask_id.startswith("gp_system_"):
+                text = mask_id.replace("gp_system_", "")
+                section = "technologies_os"
+    return text, section
+
 
-        grouped_results[section].append(text)
+def extract_classified_list_items(soup):
+    grouped_results = defaultdict(list)
+
+    # Single top-down pass: each container resolves its RESP_SECTION_MAP section once and hands it
+    # down to its children, so a matched <li> already knows its section when it is reached.
+    stack = [(soup, "unknown")]
+    while stack:
+        node, section = stack.pop()
+        if node is not soup:
+            if is_list_item(node):
+                text = node.get_text(" ", strip=True)
+                try:
+                    text, item_section = classify_list_item(node, text, section)
+                except Exception:
+                    item_section = "unknown"
+                grouped_results[item_section].append(text)
+            section = RESP_SECTION_MAP.get(node.get("data-scroll-id", "").lower(), section)
+
+        children = [child for child in node.contents if isinstance(child, Tag)]
+        stack.extend((child, section) for child in reversed(children))
 
     return dict(grouped_results)
 
 
-def collect_job_details(job_meta, scraper):
-    soup = get_soup(job_meta["link"], scraper=scraper)
-    if not soup:
+def collect_job_details(job_meta, scraper=None, parser="bs4", cache=None, archive=None):
+    html = fetch_html(job_meta["link"], scraper=scraper, cache=cache, archive=archive)
+    if html is None:
         return None
+    return parse_job_details(html, job_meta, parser=parser)
+
+
+def parse_job_details(html, job_meta, parser="bs4"):
+    """Build the details dict for ``job_meta`` from an already fetched page."""
+    res, timings = parse_job_details_timed(html, job_meta, parser)
+    observe_parse(parser, timings)
+    return res
 
+
+def parse_job_details_timed(html, job_meta, parser="bs4"):
+    """``parse_job_details`` plus its (parse, extract) seconds, for process-pool workers to hand back."""
+    start = time.perf_counter()
+    if parser == "lxml":
+        from lxml_extractor import extract_job_details_from_root, parse_document
+        document, extract = parse_document(html), extract_job_details_from_root
+    elif parser == "bs4":
+        document, extract = BeautifulSoup(html, "html.parser"), extract_job_details
+    else:
+        raise ValueError(f"Unknown parser backend: {parser}")
+    parsed = time.perf_counter()
+    res = extract(document, job_meta)
+    return res, (parsed - start, time.perf_counter() - parsed)
+
+
+def extract_job_details(soup, job_meta):
     def safe_text(selector):
         el = soup.select_one(selector)
         return el.get_text(strip=True) if el else ""
@@ -158,17 +207,15 @@ def collect_job_details(job_meta, scraper):
             return text_node.strip() if text_node else ""
         return ""
 
-    title = safe_text('[data-test="text-positionName"]')
-    company_name = safe_text_company('h2[data-scroll-id="employer-name"]')
-    location = safe_text('[data-test="sections-benefit-workplaces"] [data-test="offer-badge-title"]')
-    salary = safe_text('[data-test="text-earningAmount"]').replace("\xa0", " ")
-    work_type = safe_text('[data-test="sections-benefit-work-schedule"] [data-test="offer-badge-title"]')
-    experience = safe_text('[data-test="sections-benefit-employment-type-name"] [data-test="offer-badge-title"]')
-    contract_type = safe_text('[data-test="sections-benefit-contracts"] [data-test="offer-badge-title"]')
-    operating_mode = safe_text('[data-scroll-id="work-modes"] [data-test="offer-badge-title"]')
+    fields = {name: safe_text(selector) for name, selector in FIELD_SELECTORS.items()}
+    fields["company_name"] = safe_text_company(COMPANY_SELECTOR)
 
-    specification = extract_classified_list_items(soup)
+    return build_job_details(job_meta, fields, extract_classified_list_items(soup))
 
+
+def build_job_details(job_meta, fields, specification):
+    """Assemble the output record; shared by every parser backend so their output stays identical."""
+    salary = fields["salary"].replace("\xa0", " ")
     if "–" in salary:
         salary_low, salary_high = map(lambda x: x.strip(), salary.split("–"))
     else:
@@ -176,15 +223,15 @@ def collect_job_details(job_meta, scraper):
 
     return {
         "url": job_meta.get("link", ""),
-        "title": title or job_meta.get("title", ""),
-        "company_name": company_name or job_meta.get("company", ""),
-        "location": location or job_meta.get("location", ""),
+        "title": fields["title"] or job_meta.get("title", ""),
+        "company_name": fields["company_name"] or job_meta.get("company", ""),
+        "location": fields["location"] or job_meta.get("location", ""),
         "salary_low": salary_low,
         "salary_high": salary_high,
-        "work_type": work_type,
-        "experience": experience,
-        "contract_type": contract_type,
-        "operating_mode": operating_mode,
+        "work_type": fields["work_type"],
+        "experience": fields["experience"],
+        "contract_type": fields["contract_type"],
+        "operating_mode": fields["operating_mode"],
         "specification": specification,
         "date": job_meta.get("date", ""),
         "link_main": job_meta.get("link", ""),
@@ -195,70 +242,497 @@ def collect_job_details(job_meta, scraper):
     }
 
 
-
 def update_json(file_path, new_data):
-    existing = []
-    if os.path.exists(file_path):
+    """
+    Append the records of ``new_data`` (any iterable) whose URL is not in the JSON array at
+    ``file_path`` yet. Both sides are streamed; only the URLs are held in memory.
+    """
+    existing_urls = set()
+    keep_existing = os.path.exists(file_path)
+    if keep_existing:
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                existing = json.load(f)
+            for item in iter_json_array(file_path):
+                if isinstance(item, dict) and "url" in item:
+                    existing_urls.add(item["url"])
         except Exception:
-            existing = []
-    if not isinstance(existing, list):
-        existing = []
-
-    existing_urls = {item["url"] for item in existing if "url" in item}
-    merged = existing + [item for item in new_data if item.get("url") not in existing_urls]
-
+            keep_existing = False
+            existing_urls = set()
+
+    with JsonArrayWriter(file_path, indent=2) as out:
+        if keep_existing:
+            for item in iter_json_array(file_path):
+                out.write(item)
+        for item in new_data:
+            url = item.get("url")
+            if url not in existing_urls:
+                out.write(item)
+                if url is not None:
+                    existing_urls.add(url)
+
+
+def replace_records(file_path, new_file):
+    """
+    Rewrite ``file_path`` (JSON array or NDJSON) so the records of the NDJSON ``new_file`` replace
+    existing records with the same URL; other existing records are kept. Only URLs are held in memory.
+    """
+    new_urls = {item.get("url") for item in iter_ndjson(new_file)}
+
+    def merged():
+        if os.path.exists(file_path):
+            for item in iter_records(file_path):
+                if item.get("url") not in new_urls:
+                    yield item
+        yield from iter_ndjson(new_file)
+
+    if file_path.endswith(".json"):
+        with JsonArrayWriter(file_path, indent=2) as out:
+            for item in merged():
+                out.write(item)
+        return
     tmp = file_path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(merged, f, ensure_ascii=False, indent=2)
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    with NdjsonSink(tmp) as sink:
+        for item in merged():
+            sink.write(item)
     os.replace(tmp, file_path)
 
 
-def collect_job_details_from_links(year, links_file, output_dir, max_workers=20):
-    with open(links_file, "r", encoding="utf-8") as f:
-        links_data = json.load(f)
+def shard_suffix(shard):
+    return f".shard-{shard[0]:03d}-of-{shard[1]:03d}" if shard else ""
+
+
+class DetailsCollector:
+    """
+    Progress output, result hand-off and journal bookkeeping shared by every fetch backend.
+
+    ``replay=True`` is for re-extracting stored pages: every offer is processed regardless of the
+    journal and the index, a page that is not stored is not a failed fetch, and the new records
+    replace the ones with the same URL in the output instead of being dropped as duplicates.
+    """
+
+    def __init__(self, year, links_file, output_dir, journal_path=None, output_format="ndjson", cache_dir=None,
+                 offline=False, archive_dir=None, index_path=None, links_data=None, shard=None, metrics_path=None,
+                 replay=False):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+        # Offline runs replay the response cache, so a cache miss is not a failed fetch either.
+        replay = replay or offline
+
+        if links_data is None:
+            with open(links_file, "r", encoding="utf-8") as f:
+                links_data = json.load(f)
+        if shard:
+            # Offers are partitioned by a stable hash of their ID, so every node gets a disjoint slice.
+            index, count = shard
+            links_data = [item for item in links_data if shard_of(offer_id(item.get("link")), count) == index]
+        self.links_data = links_data
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_file = os.path.join(output_dir, f"details_{year}{shard_suffix(shard)}.{output_format}")
+        # Records go to disk as they complete. The json format spools them to NDJSON and merges
+        # them into the array file at the end, so nothing accumulates in memory either way.
+        self.output_format = output_format
+        self.replay = replay
+        self.spool_file = None if output_format == "ndjson" and not replay else self.output_file + ".spool.ndjson"
+        if replay and os.path.exists(self.spool_file):
+            os.remove(self.spool_file)
+        self.journal = CrawlJournal(journal_path) if journal_path else None
+        self.cache = open_cache(cache_dir, offline)
+        self.archive = ArchiveWriter(archive_dir) if archive_dir else None
+        # Keyword arguments for fetch_html / collect_job_details / AsyncFetcher.
+        self.fetch_options = {"cache": self.cache, "archive": self.archive}
+        self.index = OfferIndex(index_path) if index_path else None
+        # Offers are only marked done once their record is fsynced, so a crash never leaves the
+        # journal or the index claiming a record the output file does not have.
+        self.sink = NdjsonSink(self.spool_file or self.output_file, on_sync=self._mark_synced)
+        self.metrics_path = metrics_path
+        if replay:
+            self.todo = self.links_data
+        else:
+            self.todo = self.journal.pending(self.links_data) if self.journal else self.links_data
+        skipped = len(self.links_data) - len(self.todo)
+        if skipped:
+            print(f"⏭️ Skipping {skipped} offers already in journal {journal_path}")
+        if self.index and not replay:
+            pending = len(self.todo)
+            self.todo = self.index.missing(self.todo)
+            if pending > len(self.todo):
+                print(f"⏭️ Skipping {pending - len(self.todo)} offers with details in index {index_path}")
+        self.total = len(self.todo)
+        self.processed = 0
+        self.saved = 0
+
+    def add(self, job_meta, res):
+        self.processed += 1
+        i, total = self.processed, self.total
+        if res:
+            self.saved += 1
+            OFFERS.inc(result="saved")
+            with WRITE_SECONDS.time():
+                # The json format merges earlier runs' records from the journal, so it keeps them there.
+                self.sink.write(res, (job_meta.get("link"), res if self.output_format == "json" else None))
+            if i % 100 == 0:
+                print(f"[{i}/{total}] ✔️ Progress: {i}/{total}")
+                if self.metrics_path:
+                    METRICS.write(self.metrics_path)
+        elif self.replay:
+            # Not stored, so there was nothing to re-extract; no fetch was attempted.
+            OFFERS.inc(result="missing")
+            print(f"[{i}/{total}] ⏭️ Not stored: {job_meta.get('link')}")
+        else:
+            OFFERS.inc(result="failed")
+            if self.journal:
+                self.journal.mark_failed(job_meta.get("link"))
+            if self.index:
+                self.index.mark(job_meta.get("link"), FAILED)
+            print(f"[{i}/{total}] ❌ {job_meta.get('link')}")
+
+    def _mark_synced(self, done):
+        if self.journal:
+            self.journal.mark_done_many(done)
+        if self.index:
+            self.index.mark_many([url for url, _ in done], DONE, self.output_file)
+
+    def error(self, job_meta, e):
+        self.processed += 1
+        OFFERS.inc(result="error")
+        if self.journal and not self.replay:
+            self.journal.mark_failed(job_meta.get("link"), retry_after=RETRY_DELAY)
+        if self.index and not self.replay:
+            self.index.mark(job_meta.get("link"), FAILED)
+        print(f"[{self.processed}/{self.total}] ❌ Error {job_meta.get('link')}: {e}")
+
+    def finish(self):
+        if self.metrics_path:
+            METRICS.write(self.metrics_path)
+        if self.cache:
+            cache = self.cache
+            print(f"🗄️ Cache: {cache.hits} hits ({cache.revalidated} revalidated), {cache.misses} misses, "
+                  f"{cache.stored} stored")
+            self.cache.close()
+        if self.archive:
+            print(f"📦 Archived {self.archive.written} pages → {self.archive.directory}")
+            self.archive.close()
+        # Closing the sink fsyncs the last records and marks them done, so it goes before the index.
+        self.sink.close()
+        if self.index:
+            self.index.close()
+        if self.replay:
+            replace_records(self.output_file, self.spool_file)
+            if self.journal:
+                self.journal.close()
+            os.remove(self.spool_file)
+            print(f"♻️ Wrote {self.saved} re-extracted offers → {self.output_file}")
+            return
+        if not self.spool_file:
+            if self.journal:
+                self.journal.close()
+            print(f"💾 Appended {self.saved} offers → {self.output_file}")
+            return
+
+        results = iter_ndjson(self.spool_file)
+        if self.journal:
+            # Offers finished by an earlier, interrupted run only live in the journal.
+            todo = {item.get("link") for item in self.todo}
+            resumed = [item.get("link") for item in self.links_data if item.get("link") not in todo]
+            results = itertools.chain(results, self.journal.done_payloads(resumed))
+        update_json(self.output_file, results)
+        if self.journal:
+            self.journal.close()
+        os.remove(self.spool_file)
+        print(f"💾 Saved {self.saved} new offers → {self.output_file}")
+
+
+def iter_bounded(executor, fn, items, window):
+    """
+    Submit ``fn(item)`` for the items of a (possibly lazy) iterable, keeping at most ``window``
+    futures in flight, and yield ``(item, future)`` as they complete.
+    """
+    items = iter(items)
+    pending = {}
+
+    def fill():
+        for item in itertools.islice(items, window - len(pending)):
+            pending[executor.submit(fn, item)] = item
+        QUEUE_DEPTH.set(len(pending), queue="in_flight")
+
+    fill()
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield pending.pop(future), future
+        fill()
+
+
+def collect_job_details_scheduled(months, output_dir, max_workers=20, window=None, parser="bs4", cache_dir=None,
+                                  offline=False, archive_dir=None, **collector_options):
+    """
+    Fetch many months through one shared thread pool. ``months`` yields ``(month_key, links_data)``;
+    every month keeps its own collector and output file, but offers are fed from month after month
+    into a single bounded window, so the workers stay busy across month boundaries.
+    """
+    window = window or max_workers * 4
+    # One cache and archive for all months: per-month writers would race for the same segment files.
+    cache = open_cache(cache_dir, offline)
+    archive = ArchiveWriter(archive_dir) if archive_dir else None
+    outstanding = {}
+
+    def work_items():
+        for month_key, links_data in months:
+            collector = DetailsCollector(month_key, None, output_dir, links_data=links_data, replay=offline,
+                                         **collector_options)
+            print(f"📅 Queued {month_key}: {collector.total} offers")
+            if not collector.total:
+                collector.finish()
+                continue
+            outstanding[collector] = collector.total
+            for job_meta in collector.todo:
+                yield collector, job_meta
+
+    def fetch(item):
+        return collect_job_details(item[1], parser=parser, cache=cache, archive=archive)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        for (collector, job_meta), future in iter_bounded(ex, fetch, work_items(), window):
+            try:
+                collector.add(job_meta, future.result())
+            except Exception as e:
+                collector.error(job_meta, e)
+            outstanding[collector] -= 1
+            if not outstanding[collector]:
+                del outstanding[collector]
+                collector.finish()
+
+    if cache:
+        print(f"🗄️ Cache: {cache.hits} hits ({cache.revalidated} revalidated), {cache.misses} misses, "
+              f"{cache.stored} stored")
+        cache.close()
+    if archive:
+        print(f"📦 Archived {archive.written} pages → {archive.directory}")
+        archive.close()
+
+
+def collect_job_details_from_links(year, links_file, output_dir, max_workers=20, backend="threads", parser="bs4",
+                                   journal_path=None, output_format="ndjson", cache_dir=None, offline=False,
+                                   archive_dir=None, index_path=None, shard=None, metrics_path=None, window=None,
+                                   **backend_kwargs):
+    collector_options = {
+        "journal_path": journal_path,
+        "output_format": output_format,
+        "cache_dir": cache_dir,
+        "offline": offline,
+        "index_path": index_path,
+        "shard": shard,
+        "metrics_path": metrics_path,
+    }
+    if backend == "archive":
+        return reextract_job_details_from_archive(year, links_file, output_dir, archive_dir, workers=max_workers,
+                                                  parser=parser, **collector_options)
+    collector_options["archive_dir"] = archive_dir
+    if backend == "asyncio":
+        from async_fetcher import collect_job_details_from_links_async
+        return collect_job_details_from_links_async(year, links_file, output_dir, parser=parser,
+                                                    **collector_options, **backend_kwargs)
+    if backend == "pipeline":
+        return collect_job_details_pipeline(year, links_file, output_dir, fetch_workers=max_workers, parser=parser,
+                                            **collector_options, **backend_kwargs)
+    if backend != "threads":
+        raise ValueError(f"Unknown fetch backend: {backend}")
+
+    collector = DetailsCollector(year, links_file, output_dir, **collector_options)
+
+    print(f"📅 Collecting {collector.total} offers for {year}...")
+
+    def fetch(job_meta):
+        return collect_job_details(job_meta, parser=parser, **collector.fetch_options)
+
+    # Only a bounded window of offers is in flight; each result is handed to the sink as it completes.
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        for job_meta, future in iter_bounded(ex, fetch, collector.todo, window or max_workers * 4):
+            try:
+                collector.add(job_meta, future.result())
+            except Exception as e:
+                collector.error(job_meta, e)
 
-    os.makedirs(output_dir, exist_ok=True)
-    output_file = os.path.join(output_dir, f"details_{year}.json")
+    collector.finish()
 
-    print(f"📅 Collecting {len(links_data)} offers for {year}...")
 
-    scrapers = [make_scraper() for _ in range(max_workers)]
+def collect_job_details_pipeline(year, links_file, output_dir, fetch_workers=20, parse_workers=None, queue_size=256,
+                                 parser="bs4", **collector_options):
+    """
+    Two-stage variant of ``collect_job_details_from_links``: fetcher threads only
+    download pages and push them into a bounded queue, a process pool parses them.
+    """
+    collector = DetailsCollector(year, links_file, output_dir, **collector_options)
+    parse_workers = parse_workers or os.cpu_count() or 1
 
-    def task(job_meta, idx):
-        scraper = scrapers[idx]
-        return collect_job_details(job_meta, scraper)
+    print(f"📅 Collecting {collector.total} offers for {year} ({fetch_workers} fetchers, {parse_workers} parsers)...")
 
-    results = []
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        futures = {
-            ex.submit(task, job_meta, i % max_workers): job_meta
-            for i, job_meta in enumerate(links_data)
-        }
+    html_queue = queue.Queue(maxsize=queue_size)
+    jobs = iter(collector.todo)
+    jobs_lock = threading.Lock()
 
-        for i, future in enumerate(as_completed(futures), 1):
-            job_meta = futures[future]
+    def fetcher():
+        try:
+            while True:
+                with jobs_lock:
+                    job_meta = next(jobs, None)
+                if job_meta is None:
+                    break
+                try:
+                    html = fetch_html(job_meta["link"], **collector.fetch_options)
+                except Exception as e:
+                    print(f"⚠️ Wyjątek przy pobieraniu {job_meta.get('link')}: {e}")
+                    html = None
+                html_queue.put((job_meta, html))
+                QUEUE_DEPTH.set(html_queue.qsize(), queue="html")
+        finally:
+            html_queue.put(None)
+
+    threads = [threading.Thread(target=fetcher, daemon=True) for _ in range(fetch_workers)]
+    for t in threads:
+        t.start()
+
+    def harvest(done_futures):
+        for future in done_futures:
+            job_meta = pending.pop(future)
             try:
-                res = future.result()
-                if res:
-                    results.append(res)
-                    if i % 100 == 0:
-                        print(f"[{i}/{len(links_data)}] ✔️ Progress: {i}/{len(links_data)}")
-                else:
-                    print(f"[{i}/{len(links_data)}] ❌ {job_meta.get('link')}")
+                res, timings = future.result()
             except Exception as e:
-                print(f"[{i}/{len(links_data)}] ❌ Error {job_meta.get('link')}: {e}")
+                collector.error(job_meta, e)
+                continue
+            observe_parse(parser, timings)
+            collector.add(job_meta, res)
+        QUEUE_DEPTH.set(len(pending), queue="parse")
+
+    pending = {}
+    finished_fetchers = 0
+    with ProcessPoolExecutor(max_workers=parse_workers) as pool:
+        while finished_fetchers < fetch_workers:
+            item = html_queue.get()
+            if item is None:
+                finished_fetchers += 1
+                continue
+            job_meta, html = item
+            if html is None:
+                collector.add(job_meta, None)
+                continue
+            pending[pool.submit(parse_job_details_timed, html, job_meta, parser)] = job_meta
+            QUEUE_DEPTH.set(len(pending), queue="parse")
+            # Keep only a couple of pages per parser in flight so memory stays bounded.
+            if len(pending) >= parse_workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                harvest(done)
+        harvest(list(pending))
+
+    for t in threads:
+        t.join()
+
+    collector.finish()
+
+
+def enqueue_link_files(queue_path, links_files):
+    """
+    Put one ``{"year": ..., "links_file": ...}`` item per existing ``(year, links_file)`` into a shared
+    work queue, newest year first. Items already queued are left alone, so every node may call this.
+    """
+    with WorkQueue(queue_path) as work:
+        for year, links_file in links_files:
+            if not os.path.exists(links_file):
+                print(f"🚫 Missing file: {links_file}")
+                continue
+            work.put([(f"details:{year}", {"year": year, "links_file": links_file})], priority=year)
+
+
+def collect_job_details_from_queue(queue_path, output_dir, owner=None, **kwargs):
+    """
+    Work through link files leased from a shared work queue until it has nothing ready. Items carry
+    ``{"year": ..., "links_file": ...}``; ``kwargs`` go to ``collect_job_details_from_links``.
+    """
+    with WorkQueue(queue_path) as work:
+        handled = drain(
+            work,
+            lambda item: collect_job_details_from_links(item["year"], item["links_file"], output_dir, **kwargs),
+            owner,
+        )
+        print(f"📊 Queue {queue_path}: {work.counts()}, {handled} link files handled here")
+
+
+def merge_shard_outputs(output_dir, year, output_format="ndjson"):
+    """Fold the per-shard outputs of ``year`` into ``details_{year}``, keeping one record per URL."""
+    shard_files = sorted(path for path in glob(os.path.join(output_dir, f"details_{year}.shard-*-of-*.{output_format}"))
+                         if not path.endswith(".spool.ndjson"))
+    if not shard_files:
+        print(f"🚫 No shard files for details_{year} in {output_dir}")
+        return
+    output_file = os.path.join(output_dir, f"details_{year}.{output_format}")
+    if output_format == "ndjson":
+        with NdjsonSink(output_file) as sink:
+            for shard_file in shard_files:
+                for record in iter_records(shard_file):
+                    sink.write(record)
+        compact(output_file)
+    else:
+        update_json(output_file, (record for shard_file in shard_files for record in iter_records(shard_file)))
+    print(f"🔗 Merged {len(shard_files)} shard files → {output_file}")
 
-    for s in scrapers:
-        try: s.close()
-        except: pass
 
-    update_json(output_file, results)
-    print(f"💾 Saved {len(results)} offers → {output_file}")
+_archive_readers = {}
 
 
+def _parse_archived_chunk(archive_dir, chunk, parser):
+    """Process-pool worker: read pages from the memory-mapped archive and extract them."""
+    reader = _archive_readers.get(archive_dir)
+    if reader is None:
+        reader = _archive_readers[archive_dir] = ArchiveReader(archive_dir)
+    out = []
+    for job_meta, location in chunk:
+        try:
+            res, timings = parse_job_details_timed(reader.read_at(*location), job_meta, parser)
+            out.append((job_meta, res, timings, None))
+        except Exception as e:
+            out.append((job_meta, None, None, e))
+    return out
+
+
+def reextract_job_details_from_archive(year, links_file, output_dir, archive_dir, workers=None, parser="bs4",
+                                       chunk_size=64, **collector_options):
+    """
+    Rebuild the details output from archived pages only, on all cores and without any network access.
+    Re-extracted records replace earlier ones with the same URL, so a selector fix takes effect.
+    """
+    collector = DetailsCollector(year, links_file, output_dir, replay=True, **collector_options)
+    workers = workers or os.cpu_count() or 1
+
+    reader = ArchiveReader(archive_dir)
+    locations = reader.locate(job_meta.get("link") for job_meta in collector.todo)
+    reader.close()
+
+    print(f"📅 Re-extracting {len(locations)}/{collector.total} archived offers for {year} on {workers} processes...")
+
+    archived = []
+    for job_meta in collector.todo:
+        location = locations.get(job_meta.get("link"))
+        if location:
+            archived.append((job_meta, location))
+        else:
+            collector.add(job_meta, None)
+
+    # Sorting by segment and offset keeps each worker's reads sequential within a mapping.
+    archived.sort(key=lambda item: item[1])
+    chunks = [archived[i:i + chunk_size] for i in range(0, len(archived), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for results in pool.map(_parse_archived_chunk, [archive_dir] * len(chunks), chunks, [parser] * len(chunks)):
+            for job_meta, res, timings, error in results:
+                if error is not None:
+                    collector.error(job_meta, error)
+                else:
+                    observe_parse(parser, timings)
+                    collector.add(job_meta, res)
+
+    collector.finish()
+
 
 def split_links_by_month(links_data):
     grouped = defaultdict(list)
@@ -270,34 +744,24 @@ def split_links_by_month(links_data):
     return grouped
 
 
+def iter_link_months(links_files, skip_months=()):
+    """Yield ``(month_key, links_data)`` from yearly link files, one file in memory at a time."""
+    for links_file in links_files:
+        if not os.path.exists(links_file):
+            print(f"🚫 Missing file: {links_file}")
+            continue
+        for month_key, month_links in split_links_by_month(iter_records(links_file)).items():
+            if month_key not in skip_months:
+                yield month_key, month_links
+
+
 if __name__ == "__main__":
     start_year = 2023
     end_year = 2024
-    links_dir = "C:/Users/Tomasz/PycharmProjects/PythonProject/done_merged/"
+    links_dir = "done_merged"
     output_dir = "job_details_json"
+    skip_months = {f"2023-{month}" for month in ["01", "02", "03", "04", "05", "06", "10", "11", "12"]}
 
-    for year in range(start_year, end_year + 1):
-        f = os.path.join(links_dir, f"pracujpl_links_{year}_all_filtered_v2.json")
-        if not os.path.exists(f):
-            print(f"🚫 Missing file: {f}")
-            continue
-
-        with open(f, "r", encoding="utf-8") as fp:
-            links_data = json.load(fp)
-
-        grouped = split_links_by_month(links_data)
-
-        for month_key, month_links in grouped.items():
-            year_str, month_str = month_key.split("-")
-            if not (year_str == "2023" and month_str in ["01", "02", "03", "04", "05", "06", "10", "11", "12"]):
-                out_links_file = os.path.join(
-                    links_dir,
-                    f"pracujpl_details_{year_str}_{month_str}.json",
-                )
-
-                with open(out_links_file, "w", encoding="utf-8") as fp:
-                    json.dump(month_links, fp, ensure_ascii=False, indent=2)
-
-                print(f"📅 Processing {month_key}: {len(month_links)} links")
-                collect_job_details_from_links(month_key, out_links_file, output_dir)
-                gc.collect()
+    links_files = [os.path.join(links_dir, f"pracujpl_links_{year}_all_filtered_v2.json")
+                   for year in range(start_year, end_year + 1)]
+    collect_job_details_scheduled(iter_link_months(links_files, skip_months), output_dir)
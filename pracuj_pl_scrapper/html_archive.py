@@ -0,0 +1,140 @@
+import glob
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+SEGMENT_BYTES = 256 * 1024 ** 2
+SEGMENT_PATTERN = "segment-{:05d}.warc.gz"
+SEGMENT_RE = re.compile(r"segment-(\d+)\.warc\.gz$")
+
+
+def _record(url, body):
+    """One WARC 'resource' record for ``body``, compressed as its own gzip member."""
+    payload = body.encode("utf-8")
+    header = (
+        "WARC/1.0\r\n"
+        "WARC-Type: resource\r\n"
+        f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+        f"WARC-Date: {datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}\r\n"
+        f"WARC-Target-URI: {url}\r\n"
+        "Content-Type: text/html; charset=utf-8\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        "\r\n"
+    ).encode("utf-8")
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(header + payload + b"\r\n\r\n") + compressor.flush()
+
+
+def _open_index(directory):
+    conn = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS records (
+            url TEXT PRIMARY KEY,
+            segment INTEGER NOT NULL,
+            offset INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            stored_at REAL
+        )
+        """
+    )
+    return conn
+
+
+class ArchiveWriter:
+    """
+    Raw-HTML archive: WARC-style records appended to compressed, size-capped segment files,
+    with a SQLite index of URL -> (segment, offset, length). Every record is a separate gzip
+    member, so a single page can be decompressed straight from its offset.
+    """
+
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.written = 0
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = _open_index(directory)
+        # Every run starts a fresh segment, so earlier segments are never written to again.
+        existing = [int(SEGMENT_RE.search(p).group(1)) for p in glob.glob(os.path.join(directory, "segment-*.warc.gz"))]
+        self._segment = max(existing, default=-1) + 1
+        self._file = None
+
+    def _rotate(self):
+        if self._file:
+            self._file.close()
+            self._segment += 1
+        self._file = open(os.path.join(self.directory, SEGMENT_PATTERN.format(self._segment)), "ab")
+
+    def write(self, url, body):
+        record = _record(url, body)
+        with self._lock:
+            if self._file is None or self._file.tell() + len(record) > self.segment_bytes:
+                self._rotate()
+            offset = self._file.tell()
+            self._file.write(record)
+            self._file.flush()
+            self._index.execute(
+                "INSERT OR REPLACE INTO records (url, segment, offset, length, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (url, self._segment, offset, len(record), time.time()),
+            )
+            self.written += 1
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+            self._index.close()
+
+
+class ArchiveReader:
+    """Random access to archived pages through memory-mapped segments."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._index = _open_index(directory)
+        self._maps = {}
+
+    def locate(self, urls):
+        """Map each archived URL among ``urls`` to its (segment, offset, length)."""
+        urls = list(urls)
+        found = {}
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            rows = self._index.execute(
+                f"SELECT url, segment, offset, length FROM records WHERE url IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for url, segment, offset, length in rows:
+                found[url] = (segment, offset, length)
+        return found
+
+    def _map(self, segment):
+        if segment not in self._maps:
+            with open(os.path.join(self.directory, SEGMENT_PATTERN.format(segment)), "rb") as f:
+                self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._maps[segment]
+
+    def read_at(self, segment, offset, length):
+        data = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(self._map(segment)[offset:offset + length])
+        header, _, rest = data.partition(b"\r\n\r\n")
+        content_length = int(re.search(rb"Content-Length: (\d+)", header).group(1))
+        return rest[:content_length].decode("utf-8")
+
+    def read(self, url):
+        location = self.locate([url]).get(url)
+        return self.read_at(*location) if location else None
+
+    def close(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+        self._index.close()
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+MAX_CACHE_BYTES = 4 * 1024 ** 3
+
+
+class ResponseCache:
+    """
+    On-disk HTTP cache for offer pages. The SQLite index maps URL -> ETag, Last-Modified and
+    the SHA-256 of the body; bodies are stored gzip-compressed and content-addressed, so
+    identical pages share one file. Least recently used entries are evicted once the cache
+    grows past ``max_bytes``. With ``offline=True`` nothing is fetched, pages are replayed.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_CACHE_BYTES, offline=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = self.misses = self.revalidated = self.stored = 0
+        os.makedirs(os.path.join(directory, "bodies"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL,
+                last_access REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _body_path(self, sha256):
+        return os.path.join(self.directory, "bodies", sha256[:2], sha256 + ".html.gz")
+
+    def get(self, url):
+        """Cached body for ``url`` or None; refreshes its LRU position."""
+        with self._lock:
+            row = self._conn.execute("SELECT sha256 FROM entries WHERE url = ?", (url,)).fetchone()
+            if row:
+                self._conn.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url))
+        if not row:
+            self.misses += 1
+            return None
+        try:
+            with gzip.open(self._body_path(row[0]), "rt", encoding="utf-8") as f:
+                body = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return body
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since headers for revalidating a cached page."""
+        with self._lock:
+            row = self._conn.execute("SELECT etag, last_modified FROM entries WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if row and row[0]:
+            headers["If-None-Match"] = row[0]
+        if row and row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def not_modified(self, url):
+        """Handle a 304 answer: return the cached body."""
+        self.revalidated += 1
+        return self.get(url)
+
+    def store(self, url, body, etag=None, last_modified=None):
+        self.stored += 1
+        data = body.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self._body_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(gzip.compress(data, compresslevel=6))
+            os.replace(tmp, path)
+        size = os.path.getsize(path)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT sha256, size FROM entries WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (url, sha256, size, etag, last_modified, stored_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, sha256, size, etag, last_modified, now, now),
+            )
+            self._total += size - (old[1] if old else 0)
+            if old and old[0] != sha256:
+                self._drop_body_if_unused(old[0])
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _drop_body_if_unused(self, sha256):
+        if not self._conn.execute("SELECT 1 FROM entries WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone():
+            try:
+                os.remove(self._body_path(sha256))
+            except OSError:
+                pass
+
+    def _evict(self):
+        # Shrink to 90% of the budget so eviction does not run on every store.
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT url, sha256, size FROM entries ORDER BY last_access").fetchall()
+        for url, sha256, size in rows:
+            if self._total <= target:
+                break
+            self._conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._drop_body_if_unused(sha256)
+            self._total -= size
+
+
+def open_cache(cache_dir, offline=False, max_bytes=MAX_CACHE_BYTES):
+    if not cache_dir:
+        if offline:
+            raise ValueError("Offline replay needs a cache directory")
+        return None
+    return ResponseCache(cache_dir, max_bytes=max_bytes, offline=offline)
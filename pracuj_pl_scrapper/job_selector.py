@@ -1,5 +1,8 @@
 import os
-import json
+import re
+from collections import Counter
+
+from json_stream import JsonArrayWriter, iter_records
 
 # Input JSON files for 2024
 input_files = [
@@ -58,39 +61,116 @@ keywords = [
 
 
 
-def filter_json(input_file, output_file, keywords):
-    """Filter job offers in a JSON file based on keywords in the title or URL."""
-    number_of_rows = 0
-
-    with open(input_file, 'r', encoding='utf-8') as infile:
-        data = json.load(infile)
-
-    filtered_offers = []
-    for offer in data:
+def _trie_pattern(words):
+    """
+    Regex equivalent to the alternation of ``words``, factored into a character trie so the regex
+    engine tries one branch per character instead of every keyword. Matches the longest keyword.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return (body if len(branches) > 1 else "(?:" + body + ")") + "?"
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Multi-keyword substring matcher compiled into a single trie-shaped regex, so every text is
+    scanned once by the regex engine instead of once per keyword. ``matches`` returns the exact
+    set of keywords contained in the text, overlapping ones included.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = sorted({k.lower() for k in keywords if k})
+        pattern = _trie_pattern(self.keywords)
+        self._search = re.compile(pattern).search
+        # The lookahead captures the longest keyword starting at each position; every other
+        # keyword starting there is one of its prefixes.
+        self._finditer = re.compile(f"(?=({pattern}))").finditer
+        self._prefixes = {k: [p for p in self.keywords if k.startswith(p)] for k in self.keywords}
+
+    def search(self, text):
+        """True if ``text`` (already lowercased) contains any keyword."""
+        return self._search(text) is not None
+
+    def matches(self, text):
+        """Set of keywords contained in ``text`` (already lowercased)."""
+        found = set()
+        for m in self._finditer(text):
+            found.update(self._prefixes[m.group(1)])
+        return found
+
+
+class OfferFilter:
+    """
+    Keyword filter over the title and URL of one offer: calling it returns the offer, or None if
+    nothing matched. Keeps a tally of matched keywords in ``hits``.
+    """
+
+    def __init__(self, keywords, annotate=False):
+        self.matcher = keywords if isinstance(keywords, KeywordMatcher) else KeywordMatcher(keywords)
+        self.annotate = annotate
+        self.hits = Counter()
+        self.kept = 0
+
+    def __call__(self, offer):
         text_to_check = (offer.get("title", "") + " " + offer.get("link", "")).lower()
-        if any(keyword in text_to_check for keyword in keywords):
-            filtered_offers.append(offer)
-            number_of_rows += 1
-
-    # Save filtered results
-    with open(output_file, 'w', encoding='utf-8') as outfile:
-        json.dump(filtered_offers, outfile, ensure_ascii=False, indent=4)
+        if not self.matcher.search(text_to_check):
+            return None
+        matched = self.matcher.matches(text_to_check)
+        self.hits.update(matched)
+        if self.annotate:
+            offer["keywords"] = sorted(matched)
+        self.kept += 1
+        return offer
+
+    def top_keywords(self, n=10):
+        return ', '.join(f'{k} ({count})' for k, count in self.hits.most_common(n))
+
+
+def filter_json(input_file, output_file, keywords, annotate=False):
+    """
+    Filter job offers in a JSON (or NDJSON) file based on keywords in the title or URL.
+    With ``annotate=True`` every kept offer gets a "keywords" list of what it matched.
+    """
+    select = OfferFilter(keywords, annotate)
+
+    # Offers are streamed from the input straight into the output, one at a time.
+    with JsonArrayWriter(output_file, indent=4) as outfile:
+        for offer in iter_records(input_file):
+            offer = select(offer)
+            if offer is not None:
+                outfile.write(offer)
 
     print(f"✅ {input_file} → {output_file}")
-    print(f"   Number of relevant job offers: {number_of_rows}")
+    print(f"   Number of relevant job offers: {select.kept}")
+    print(f"   Top keywords: {select.top_keywords()}")
+    return select.hits
 
 
-# Main logic
-for file in input_files:
-    base_path = 'C:/Users/Tomasz/PycharmProjects/PythonProject'
-    if not os.path.exists(base_path):
-        os.makedirs(base_path)
+if __name__ == "__main__":
+    matcher = KeywordMatcher(keywords)
 
-    sub_path = os.path.dirname(file)
-    output_path = os.path.join(base_path, sub_path)
-    os.makedirs(output_path, exist_ok=True)
+    # Main logic
+    for file in input_files:
+        base_path = '.'
+        sub_path = os.path.dirname(file)
+        output_path = os.path.join(base_path, sub_path)
+        os.makedirs(output_path, exist_ok=True)
 
-    output = os.path.basename(file).replace('.json', '_filtered')
-    output_file = f'{output_path}/{output}_v2.json'
+        output = os.path.basename(file).replace('.json', '_filtered')
+        output_file = f'{output_path}/{output}_v2.json'
 
-    filter_json(file, output_file, keywords)
+        filter_json(file, output_file, matcher)
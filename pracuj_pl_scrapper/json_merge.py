@@ -1,16 +1,67 @@
+import heapq
 import os
 import json
+import re
+import tempfile
 from glob import glob
 
-def merge_yearly_files(base_path):
-    """Merge all monthly JSON files into one per year."""
-    for year_dir in os.listdir(base_path):
+from json_stream import JsonArrayWriter, iter_json_array, iter_ndjson
+
+MERGED_DIR = "done_merged"
+OFFER_ID_RE = re.compile(r",oferta,(\d+)")
+
+
+def offer_id(url):
+    """Normalized offer ID: the numeric pracuj.pl offer ID, else the URL without query, fragment and case."""
+    match = OFFER_ID_RE.search(url or "")
+    if match:
+        return match.group(1)
+    return (url or "").split("#", 1)[0].split("?", 1)[0].rstrip("/").lower()
+
+
+def merge_key(offer):
+    return offer.get("date", ""), offer.get("link", "")
+
+
+def sorted_run(json_file, run_dir):
+    """Sort one monthly file by date and URL into an NDJSON run file; the run path, or None if unreadable."""
+    try:
+        offers = sorted(iter_json_array(json_file), key=merge_key)
+    except json.JSONDecodeError:
+        print(f"❌ Could not decode {json_file}")
+        return None
+    except ValueError:
+        print(f"⚠️ File {json_file} does not contain a list.")
+        return None
+    run_path = os.path.join(run_dir, os.path.basename(json_file) + ".ndjson")
+    with open(run_path, "w", encoding="utf-8") as f:
+        for offer in offers:
+            f.write(json.dumps(offer, ensure_ascii=False) + "\n")
+    return run_path
+
+
+def merge_yearly_files(base_path, output_dir=MERGED_DIR, years=None, select=None, suffix="_all"):
+    """
+    Merge all monthly JSON files into one per year, sorted by date and URL, keeping the first
+    record of every offer ID. Each month is sorted on its own and the months are k-way merged,
+    so only one month is ever held in memory. Returns {year: (read, duplicates, written)}.
+
+    ``years`` limits the merge to those year directories. ``select(offer)`` returns the record to
+    write or None to drop it, so a filter can run inside the merge instead of over its output.
+    """
+    if not os.path.isdir(base_path):
+        print(f"🚫 Missing directory: {base_path}")
+        return {}
+    os.makedirs(output_dir, exist_ok=True)
+    counts = {}
+    for year_dir in sorted(os.listdir(base_path)):
         year_path = os.path.join(base_path, year_dir)
         if not os.path.isdir(year_path):
             continue
+        if years is not None and year_dir not in {str(year) for year in years}:
+            continue
 
-        output_file = f"C:/Users/Tomasz/PycharmProjects/PythonProject/done_merged/pracujpl_links_{year_dir}_all.json"
-        all_offers = []
+        output_file = os.path.join(output_dir, f"pracujpl_links_{year_dir}{suffix}.json")
 
         json_files = glob(os.path.join(year_path, "pracujpl_links_*.json"))
         json_files = [f for f in json_files if not f.endswith('_all.json')]
@@ -20,23 +71,31 @@ def merge_yearly_files(base_path):
             print(f"No monthly JSON files found for {year_dir}. Skipping.")
             continue
 
-        for json_file in json_files:
-            with open(json_file, "r", encoding="utf-8") as f:
-                try:
-                    data = json.load(f)
-                    if isinstance(data, list):
-                        all_offers.extend(data)
-                    else:
-                        print(f"⚠️ File {json_file} does not contain a list.")
-                except json.JSONDecodeError:
-                    print(f"❌ Could not decode {json_file}")
+        read = duplicates = 0
+        seen = set()
+        with tempfile.TemporaryDirectory(prefix=f"merge_{year_dir}_") as run_dir:
+            runs = [run for run in (sorted_run(f, run_dir) for f in json_files) if run]
+            with JsonArrayWriter(output_file, indent=4) as out:
+                for offer in heapq.merge(*(iter_ndjson(run) for run in runs), key=merge_key):
+                    read += 1
+                    key = offer_id(offer.get("link", ""))
+                    if key in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(key)
+                    if select:
+                        offer = select(offer)
+                        if offer is None:
+                            continue
+                    out.write(offer)
+                written = out.written
 
-        # Save merged file
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(all_offers, f, ensure_ascii=False, indent=4)
+        counts[year_dir] = (read, duplicates, written)
+        print(f"✅ Merged {len(json_files)} files for {year_dir} → {output_file} "
+              f"({read} offers read, {duplicates} duplicates dropped, {written} written)")
+    return counts
 
-        print(f"✅ Merged {len(json_files)} files for {year_dir} → {output_file} ({len(all_offers)} offers total)")
 
 if __name__ == "__main__":
-    base_path = r"C:\Users\Tomasz\PycharmProjects\PythonProject\done"
+    base_path = "done"
     merge_yearly_files(base_path)
@@ -0,0 +1,240 @@
+import json
+import os
+import re
+import threading
+import time
+
+FSYNC_EVERY = 500
+FSYNC_INTERVAL = 5.0
+READ_CHUNK = 1 << 16
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+
+class NdjsonSink:
+    """
+    Append-only NDJSON output. Records hit the file as soon as they are written and
+    are fsynced every ``fsync_every`` records or ``fsync_interval`` seconds. After every
+    fsync ``on_sync(tokens)`` gets the tokens passed to ``write`` for the records that just
+    became durable, so bookkeeping can wait until the data is really on disk.
+    """
+
+    def __init__(self, path, fsync_every=FSYNC_EVERY, fsync_interval=FSYNC_INTERVAL, on_sync=None):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.on_sync = on_sync
+        self.written = 0
+        self._unsynced = 0
+        self._tokens = []
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, record, token=None):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            if token is not None:
+                self._tokens.append(token)
+            self.written += 1
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        tokens, self._tokens = self._tokens, []
+        if tokens and self.on_sync:
+            self.on_sync(tokens)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+
+def iter_ndjson(path):
+    """Yield records from an NDJSON file, skipping a torn last line left by a crash."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def iter_json_array(path, chunk_size=READ_CHUNK):
+    """
+    Yield the elements of a top-level JSON array one by one, reading the file in chunks,
+    so memory stays bounded by the largest single record instead of the whole file.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf, pos, eof = "", 0, False
+
+        def more():
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+
+        def next_char():
+            nonlocal pos
+            while True:
+                pos = WHITESPACE.match(buf, pos).end()
+                if pos < len(buf):
+                    return buf[pos]
+                if eof:
+                    return ""
+                more()
+
+        if next_char() != "[":
+            raise ValueError(f"{path} does not contain a JSON array")
+        pos += 1
+        if next_char() == "]":
+            return
+        while True:
+            next_char()
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more()
+                continue
+            after = WHITESPACE.match(buf, end).end()
+            if not eof and buf[after:after + 1] not in (",", "]"):
+                # A number cut at the chunk boundary decodes too early; decode again with more input.
+                more()
+                continue
+            yield record
+            pos = end
+            separator = next_char()
+            if separator == "]":
+                return
+            if separator != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+            pos += 1
+            if pos > chunk_size:
+                buf, pos = buf[pos:], 0
+
+
+def iter_records(path):
+    """Stream records from an NDJSON (.ndjson/.jsonl) or JSON array file."""
+    if path.endswith(NDJSON_EXTENSIONS):
+        return iter_ndjson(path)
+    return iter_json_array(path)
+
+
+class JsonArrayWriter:
+    """
+    Stream records into a JSON array file, byte-identical to ``json.dump(records, f, indent=indent)``,
+    written to a temp file and renamed into place on close.
+    """
+
+    def __init__(self, path, indent=2):
+        self.path = path
+        self.indent = indent
+        self.written = 0
+        self._tmp = path + ".tmp"
+        self._file = open(self._tmp, "w", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._tmp)
+
+    def write(self, record):
+        pad = " " * self.indent
+        body = json.dumps(record, ensure_ascii=False, indent=self.indent).replace("\n", "\n" + pad)
+        self._file.write(("[\n" if self.written == 0 else ",\n") + pad + body)
+        self.written += 1
+
+    def close(self):
+        self._file.write("\n]" if self.written else "[]")
+        self._file.close()
+        os.replace(self._tmp, self.path)
+
+
+def compact(ndjson_path, json_path=None, key="url"):
+    """
+    Rewrite ``ndjson_path`` without duplicate records (first occurrence wins) or torn lines.
+    With ``json_path`` a JSON array copy is produced as well. Only the keys are held in memory.
+    """
+    seen = set()
+    tmp = ndjson_path + ".compact"
+    array = JsonArrayWriter(json_path) if json_path else None
+    kept = dropped = 0
+    with open(tmp, "w", encoding="utf-8") as out:
+        for record in iter_ndjson(ndjson_path):
+            record_key = record.get(key)
+            if record_key in seen:
+                dropped += 1
+                continue
+            if record_key is not None:
+                seen.add(record_key)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if array:
+                array.write(record)
+            kept += 1
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp, ndjson_path)
+    if array:
+        array.close()
+    print(f"🧹 Compacted {ndjson_path}: kept {kept}, dropped {dropped} duplicates")
+    return kept, dropped
+
+
+def export_parquet(ndjson_path, parquet_path, batch_size=10000):
+    """Export an NDJSON file to Parquet in batches. Nested values are stored as JSON strings."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    writer = None
+    batch = []
+
+    def flush():
+        nonlocal writer
+        rows = [
+            {k: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v for k, v in record.items()}
+            for record in batch
+        ]
+        table = pa.Table.from_pylist(rows, schema=writer.schema if writer else None)
+        if writer is None:
+            writer = pq.ParquetWriter(parquet_path, table.schema)
+        writer.write_table(table)
+        batch.clear()
+
+    for record in iter_ndjson(ndjson_path):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    if writer:
+        writer.close()
@@ -1,109 +1,263 @@
 import os
+import re
+import threading
 import time
 import json
-import random
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urljoin
 
-import cloudscraper
 from bs4 import BeautifulSoup
+from metrics import HTTP_RETRIES, observe_response
 from month import Month
+from rate_limiter import RATE_CONTROLLER, THROTTLE_STATUSES
+from session_pool import SESSION_POOL
+from work_queue import WorkQueue, drain, shard_of
 
 
-def collect_links(year, month, path_exist, max_retries=5):
-    """Collect job links and metadata for all pages in a given year and month, save to JSON."""
-    json_file = f'{path_exist}/pracujpl_links_{year}_{month}.json'
-    base_url = "https://archiwum.pracuj.pl"
-    scraper = cloudscraper.create_scraper()
+BASE_URL = "https://archiwum.pracuj.pl"
+# Monthly link files go to <LINKS_DIR>/<year>/pracujpl_links_<year>_<month>.json.
+LINKS_DIR = "."
+PAGE_NUMBER_RE = re.compile(r"PageNumber=(\d+)")
+LISTING_TIMEOUT = 15
+# Consecutive failed pages after which the end of a month can no longer be found by walking.
+MAX_FAILED_PAGES = 3
 
-    all_offers = []
-    page_num = 1
 
-    while True:
-        url = f'{base_url}/archive/offers?Year={year}&Month={month}&PageNumber={page_num}'
-        retry_count = 0
-        while retry_count < max_retries:
-            resp = scraper.get(url)
-            if resp.status_code == 429:
-                wait = 2 ** retry_count
-                print(f"429 received for {year}-{Month(month)} page {page_num}, waiting {wait}s before retry")
-                time.sleep(wait)
-                retry_count += 1
-            else:
-                break
+def listing_url(base_url, year, month, page_num):
+    return f'{base_url}/archive/offers?Year={year}&Month={month}&PageNumber={page_num}'
+
+
+def fetch_listing_page(scraper, year, month, page_num, base_url=BASE_URL, max_retries=5):
+    """Fetch one archive listing page through the shared rate controller; BeautifulSoup or None if it failed."""
+    url = listing_url(base_url, year, month, page_num)
+    retry_count = 0
+    while retry_count < max_retries:
+        RATE_CONTROLLER.acquire(url)
+        start = time.perf_counter()
+        try:
+            resp = scraper.get(url, timeout=LISTING_TIMEOUT)
+        except Exception as e:
+            HTTP_RETRIES.inc(status="error")
+            print(f"Error fetching {year}-{Month(month)} page {page_num}: {e}")
+            retry_count += 1
+            time.sleep(2 + retry_count)
+            continue
+        observe_response(resp.status_code, resp.elapsed.total_seconds(), time.perf_counter() - start,
+                         len(resp.content))
+        RATE_CONTROLLER.record(url, resp.status_code, resp.headers.get("Retry-After"))
+        if resp.status_code in THROTTLE_STATUSES:
+            HTTP_RETRIES.inc(status=resp.status_code)
+            print(f"{resp.status_code} received for {year}-{Month(month)} page {page_num}, backing off before retry")
+            retry_count += 1
         else:
-            print(f"Too many 429 responses for {year}-{Month(month)} page {page_num}. Skipping page.")
             break
+    else:
+        print(f"Too many failed attempts for {year}-{Month(month)} page {page_num}. Skipping page.")
+        return None
 
-        if resp.status_code != 200:
-            print(f"Page {page_num} returned {resp.status_code}, stopping for {year}-{month}.")
-            break
+    if resp.status_code != 200:
+        print(f"Page {page_num} returned {resp.status_code} for {year}-{month}.")
+        return None
 
-        soup = BeautifulSoup(resp.text, "html.parser")
-        offers = soup.select(".offers_item")
+    return BeautifulSoup(resp.text, "html.parser")
 
-        if not offers:
-            print(f"No offers found for year {year}, month {month}, page {page_num}. Stopping.")
-            break
 
-        print(f"Collected {len(offers)} offers for {year}-{Month(month)} page {page_num}.")
+def parse_listing(soup, base_url=BASE_URL):
+    """Return the offers of one listing page as link/title/company/location/date dicts."""
+    offers = []
+    for offer in soup.select(".offers_item"):
+        link_tag = offer.select_one(".offers_item_link[href]")
+        link = urljoin(base_url, link_tag["href"]) if link_tag else ""
 
-        for offer in offers:
-            link_tag = offer.select_one(".offers_item_link[href]")
-            link = urljoin(base_url, link_tag["href"]) if link_tag else ""
+        parts = offer.select(".offers_item_link_cnt_part")
+        title = parts[0].get_text(strip=True) if len(parts) > 0 else ""
+        company = parts[1].get_text(strip=True) if len(parts) > 1 else ""
 
-            parts = offer.select(".offers_item_link_cnt_part")
-            title = parts[0].get_text(strip=True) if len(parts) > 0 else ""
-            company = parts[1].get_text(strip=True) if len(parts) > 1 else ""
+        loc_tag = offer.select_one(".offers_item_desc_loc")
+        location = loc_tag.get_text(strip=True) if loc_tag else ""
 
-            loc_tag = offer.select_one(".offers_item_desc_loc")
-            location = loc_tag.get_text(strip=True) if loc_tag else ""
+        date_tag = offer.select_one(".offers_item_desc_date")
+        date = date_tag.get_text(strip=True) if date_tag else ""
 
-            date_tag = offer.select_one(".offers_item_desc_date")
-            date = date_tag.get_text(strip=True) if date_tag else ""
+        offers.append({
+            "link": link,
+            "title": title,
+            "company": company,
+            "location": location,
+            "date": date
+        })
+    return offers
 
-            all_offers.append({
-                "link": link,
-                "title": title,
-                "company": company,
-                "location": location,
-                "date": date
-            })
 
-        next_button = soup.select_one(".offers_nav_next")
-        if not next_button:
-            print(f"No 'Next' button found. Stopping collecting for year {year}, month {Month(month)}.")
-            break
+def page_count_hint(soup):
+    """Highest PageNumber linked from the pagination, if the page exposes one."""
+    numbers = [int(m.group(1)) for a in soup.select("a[href]") for m in [PAGE_NUMBER_RE.search(a["href"])] if m]
+    return max(numbers) if numbers else None
+
 
+def walk_page_count(get_page, last_known):
+    """
+    Find the last page by walking forward from ``last_known``, a page known to have offers.
+    Failed pages are stepped over; after MAX_FAILED_PAGES in a row the end cannot be told apart
+    from an outage, so a RuntimeError is raised.
+    """
+    page_num, failures = last_known, 0
+    while True:
+        page = get_page(page_num + 1)
+        if page is None:
+            failures += 1
+            if failures >= MAX_FAILED_PAGES:
+                raise RuntimeError(f"{failures} listing pages in a row failed after page {page_num + 1 - failures}")
+        else:
+            offers, has_next = page
+            if not offers:
+                # Failed pages just before the end are counted, so the caller reports them as failed.
+                return page_num
+            if not has_next:
+                return page_num + 1
+            failures = 0
         page_num += 1
-        time.sleep(random.uniform(1, 3))
+
+
+def find_page_count(get_page, first_page):
+    """
+    Number of the last listing page that still has offers. ``get_page(n)`` returns the parsed
+    offers of page n and whether it has a 'Next' button, or None if the page could not be fetched
+    (cached by the caller). The pagination hint is verified and, if it is stale, the end is found
+    by galloping past it and binary searching back. A failed probe says nothing about where the
+    end is, so the search then falls back to walking the pages in order.
+    """
+    hint = page_count_hint(first_page)
+    if not first_page.select_one(".offers_nav_next"):
+        return 1
+
+    lo, hi = 1, None
+    probe, step = max(hint or 2, 2), 1
+    while hi is None:
+        page = get_page(probe)
+        if page is None:
+            return walk_page_count(get_page, lo)
+        offers, has_next = page
+        if offers and not has_next:
+            return probe
+        if offers:
+            lo, probe, step = probe, probe + step, step * 2
+        else:
+            hi = probe
+
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        page = get_page(mid)
+        if page is None:
+            return walk_page_count(get_page, lo)
+        offers, has_next = page
+        if offers and not has_next:
+            return mid
+        if offers:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def collect_links(year, month, path_exist, max_retries=5, page_workers=4, base_url=BASE_URL):
+    """Collect job links and metadata for all pages in a given year and month, save to JSON."""
+    json_file = f'{path_exist}/pracujpl_links_{year}_{month}.json'
+
+    pages = {}
+    pages_lock = threading.Lock()
+
+    def get_page(page_num):
+        with pages_lock:
+            if page_num in pages:
+                return pages[page_num]
+        with SESSION_POOL.session() as scraper:
+            soup = fetch_listing_page(scraper, year, month, page_num, base_url, max_retries)
+        # None marks a failed fetch, as opposed to a page that loaded but has no offers.
+        page = (parse_listing(soup, base_url), bool(soup.select_one(".offers_nav_next"))) if soup else None
+        with pages_lock:
+            pages[page_num] = page
+        return page
+
+    with SESSION_POOL.session() as scraper:
+        first_page = fetch_listing_page(scraper, year, month, 1, base_url, max_retries)
+    if first_page is None:
+        raise RuntimeError(f"First listing page of {year}-{Month(month)} could not be fetched")
+    pages[1] = (parse_listing(first_page, base_url), False)
+    if not pages[1][0]:
+        print(f"No offers found for year {year}, month {month}, page 1. Stopping.")
+        page_count = 0
+    else:
+        page_count = find_page_count(get_page, first_page)
+        print(f"{year}-{Month(month)} has {page_count} pages, fetching with {page_workers} workers.")
+
+    # Pages are independent, so fetch the rest concurrently and put them back in page order.
+    with ThreadPoolExecutor(max_workers=page_workers) as executor:
+        list(executor.map(get_page, range(2, page_count + 1)))
+
+    all_offers = []
+    failed = []
+    for page_num in range(1, page_count + 1):
+        page = pages.get(page_num)
+        if page is None:
+            failed.append(page_num)
+            continue
+        if not page[0]:
+            print(f"No offers on page {page_num} for {year}-{Month(month)}, page skipped.")
+        all_offers.extend(page[0])
+    print(f"Collected {len(all_offers)} offers for {year}-{Month(month)} from {page_count} pages.")
 
     # Save to JSON
     with open(json_file, 'w', encoding='utf-8') as f:
         json.dump(all_offers, f, ensure_ascii=False, indent=4)
 
+    # The partial month is kept, but the caller has to know it is incomplete (a queued month is retried).
+    if failed:
+        raise RuntimeError(f"{len(failed)} listing pages of {year}-{Month(month)} failed: {failed}")
 
-def collect_links_all_years(start_year=2017, end_year=2025, max_workers=12):
-    """Run scraping in parallel across all months and years with shared workers."""
+
+def collect_links_all_years(start_year=2017, end_year=2025, max_workers=12, shard=None, queue_path=None,
+                            output_dir=LINKS_DIR, page_workers=4):
+    """
+    Run scraping in parallel across all months and years with shared workers.
+    ``shard=(index, count)`` keeps only the months hashed to this node; with ``queue_path`` the
+    months go through a shared lease/ack work queue instead, newest year first.
+    """
     tasks = []
     for year in range(start_year, end_year + 1):
-        path_exist = f'C:/Users/Tomasz/PycharmProjects/PythonProject/{year}'
+        path_exist = os.path.join(output_dir, str(year))
         os.makedirs(path_exist, exist_ok=True)
         for month in range(1, 13):
+            if shard and shard_of(f"{year}-{month:02d}", shard[1]) != shard[0]:
+                continue
             tasks.append((year, month, path_exist))
 
     start_time = time.time()
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(collect_links, year, month, path): (year, month)
-                   for year, month, path in tasks}
-
-        for future in as_completed(futures):
-            year, month = futures[future]
-            try:
-                future.result()
-                print(f"✅ Finished {year}-{Month(month)}")
-            except Exception as e:
-                print(f"❌ Error for {year}-{month}: {e}")
+    if queue_path:
+        queue = WorkQueue(queue_path)
+        for year, month, path in tasks:
+            queue.put([(f"links:{year}-{month:02d}", {"year": year, "month": month, "path": path})], priority=year)
+
+        def handle(task):
+            collect_links(task["year"], task["month"], task["path"], page_workers=page_workers)
+            print(f"✅ Finished {task['year']}-{Month(task['month'])}")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            handled = sum(executor.map(lambda _: drain(queue, handle), range(max_workers)))
+        print(f"📊 Queue {queue_path}: {queue.counts()}, {handled} months handled here")
+        queue.close()
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(collect_links, year, month, path, page_workers=page_workers): (year, month)
+                       for year, month, path in tasks}
+
+            for future in as_completed(futures):
+                year, month = futures[future]
+                try:
+                    future.result()
+                    print(f"✅ Finished {year}-{Month(month)}")
+                except Exception as e:
+                    print(f"❌ Error for {year}-{month}: {e}")
 
     elapsed = time.time() - start_time
     print(f"All scraping done in {elapsed:.2f} seconds.")
@@ -0,0 +1,122 @@
+from collections import defaultdict
+
+from lxml import etree
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
+
+from details_extractor import (
+    COMPANY_SELECTOR,
+    FIELD_SELECTORS,
+    LIST_ITEM_CLASSES,
+    LIST_ITEM_DATA_TEST_PREFIX,
+    RESP_SECTION_MAP,
+    build_job_details,
+)
+
+# BeautifulSoup's get_text() leaves out comments and script/style/template strings.
+SKIPPED_TEXT_TAGS = {"script", "style", "template"}
+
+_PARSER = lxml_html.HTMLParser(encoding="utf-8")
+_FIELD_SELECTORS = {name: CSSSelector(selector, translator="html") for name, selector in FIELD_SELECTORS.items()}
+_COMPANY_SELECTOR = CSSSelector(COMPANY_SELECTOR, translator="html")
+_MASK_SELECTOR = CSSSelector("mask[id]", translator="html")
+
+
+def _iter_strings(el):
+    """Yield text nodes under ``el`` in document order, the way bs4's _all_strings does."""
+    if not isinstance(el.tag, str) or el.tag in SKIPPED_TEXT_TAGS:
+        return
+    if el.text:
+        yield el.text
+    for child in el:
+        yield from _iter_strings(child)
+        if child.tail:
+            yield child.tail
+
+
+def get_text(el, separator=""):
+    """Equivalent of bs4 ``Tag.get_text(separator, strip=True)``."""
+    return separator.join(s for s in (s.strip() for s in _iter_strings(el)) if s)
+
+
+def first_direct_string(el):
+    """Equivalent of bs4 ``Tag.find(string=True, recursive=False)``."""
+    if el.text:
+        return el.text
+    for child in el:
+        if child.tag is etree.Comment and child.text:
+            return child.text
+        if child.tail:
+            return child.tail
+    return None
+
+
+def parse_document(html):
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+    try:
+        return lxml_html.document_fromstring(html, parser=_PARSER)
+    except etree.ParserError:
+        # Empty documents are an error for lxml, while bs4 just returns an empty soup.
+        return lxml_html.Element("html")
+
+
+def is_list_item(el):
+    if el.tag != "li":
+        return False
+    if el.get("data-test", "").startswith(LIST_ITEM_DATA_TEST_PREFIX):
+        return True
+    return not LIST_ITEM_CLASSES.isdisjoint(el.get("class", "").split())
+
+
+def extract_classified_list_items_lxml(root):
+    grouped_results = defaultdict(list)
+
+    # Same single top-down pass as the bs4 version, driven by lxml's C-level tree walker.
+    sections = ["unknown"]
+    for event, el in etree.iterwalk(root, events=("start", "end")):
+        if event == "end":
+            sections.pop()
+            continue
+        section = sections[-1]
+        if not isinstance(el.tag, str):
+            sections.append(section)
+            continue
+
+        if is_list_item(el):
+            text = get_text(el, " ")
+            item_section = section
+            try:
+                if el.get("data-test") == "item-technologies-os":
+                    item_section = "unknown"
+                    masks = _MASK_SELECTOR(el)
+                    if masks:
+                        mask_id = masks[0].get("id", "")
+                        if mask_id.startswith("gp_system_"):
+                            text = mask_id.replace("gp_system_", "")
+                            item_section = "technologies_os"
+            except Exception:
+                item_section = "unknown"
+            grouped_results[item_section].append(text)
+
+        sections.append(RESP_SECTION_MAP.get(el.get("data-scroll-id", "").lower(), section))
+
+    return dict(grouped_results)
+
+
+def extract_job_details_lxml(html, job_meta):
+    """lxml backend for ``parse_job_details``; must stay output-identical to ``extract_job_details``."""
+    return extract_job_details_from_root(parse_document(html), job_meta)
+
+
+def extract_job_details_from_root(root, job_meta):
+    fields = {}
+    for name, selector in _FIELD_SELECTORS.items():
+        matches = selector(root)
+        fields[name] = get_text(matches[0]) if matches else ""
+
+    companies = _COMPANY_SELECTOR(root)
+    text_node = first_direct_string(companies[0]) if companies else None
+    fields["company_name"] = text_node.strip() if text_node else ""
+
+    return build_job_details(job_meta, fields, extract_classified_list_items_lxml(root))
@@ -0,0 +1,217 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 131072, 262144, 524288, 1048576, 4194304)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{str(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def snapshot(self):
+        with self._lock:
+            return [{"labels": dict(key), "value": value} for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            state["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def quantile(self, q, **labels):
+        """Estimate the ``q`` quantile by interpolating inside its bucket, like Prometheus' histogram_quantile."""
+        with self._lock:
+            state = self._values.get(_label_key(labels))
+            if not state or not state["count"]:
+                return None
+            counts = list(state["counts"])
+        rank = q * sum(counts)
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, state in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), state["counts"]):
+                    cumulative += count
+                    out.append((f"{self.name}_bucket", key + (("le", bound),), cumulative))
+                out.append((f"{self.name}_sum", key, state["sum"]))
+                out.append((f"{self.name}_count", key, state["count"]))
+        return out
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {
+                    "labels": dict(key),
+                    "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], state["counts"])),
+                    "sum": state["sum"],
+                    "count": state["count"],
+                }
+                for key, state in self._values.items()
+            ]
+
+
+class Registry:
+    """Process-wide set of metrics, exported as Prometheus text or a JSON snapshot."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name, help_text):
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name, help_text):
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            with metric._lock:
+                metric._values.clear()
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            "timestamp": time.time(),
+            "metrics": {m.name: {"type": m.kind, "help": m.help, "values": m.snapshot()} for m in metrics},
+        }
+
+    def write(self, path):
+        """Write a snapshot to ``path``: Prometheus text for ``.prom``/``.txt``, JSON otherwise."""
+        if path.endswith((".prom", ".txt")):
+            data = self.prometheus_text()
+        else:
+            data = json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+
+METRICS = Registry()
+
+HTTP_RESPONSES = METRICS.counter("pracuj_http_responses_total", "HTTP responses by status code")
+HTTP_RETRIES = METRICS.counter("pracuj_http_retries_total", "Retried requests by status code or error")
+HTTP_DNS = METRICS.histogram("pracuj_http_dns_seconds", "DNS resolution time (asyncio backend)")
+# aiohttp reports connection setup as one span, so TCP connect and the TLS handshake are measured together.
+HTTP_CONNECT = METRICS.histogram("pracuj_http_connect_seconds", "TCP connect + TLS handshake (asyncio backend)")
+HTTP_TTFB = METRICS.histogram("pracuj_http_ttfb_seconds", "Request sent until response headers received")
+HTTP_REQUEST = METRICS.histogram("pracuj_http_request_seconds", "Full request time including the body")
+HTTP_BODY_BYTES = METRICS.histogram("pracuj_http_body_bytes", "Response body size", buckets=SIZE_BUCKETS)
+PARSE_SECONDS = METRICS.histogram("pracuj_parse_seconds", "HTML parsing time by parser")
+EXTRACT_SECONDS = METRICS.histogram("pracuj_extract_seconds", "Field extraction time by parser")
+WRITE_SECONDS = METRICS.histogram("pracuj_write_seconds", "Time to hand one record to the output")
+OFFERS = METRICS.counter("pracuj_offers_total", "Processed offers by result")
+QUEUE_DEPTH = METRICS.gauge("pracuj_queue_depth", "Items waiting or in flight by queue")
+
+
+def observe_response(status, ttfb=None, total=None, body_bytes=None):
+    HTTP_RESPONSES.inc(status=status)
+    if ttfb is not None:
+        HTTP_TTFB.observe(ttfb)
+    if total is not None:
+        HTTP_REQUEST.observe(total)
+    if body_bytes is not None:
+        HTTP_BODY_BYTES.observe(body_bytes)
+
+
+def observe_parse(parser, timings):
+    parse_seconds, extract_seconds = timings
+    PARSE_SECONDS.observe(parse_seconds, parser=parser)
+    EXTRACT_SECONDS.observe(extract_seconds, parser=parser)
@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from crawl_journal import DONE, FAILED, PENDING
+from json_merge import offer_id
+from json_stream import iter_records
+
+LINKS = "links"
+DETAILS = "details"
+BATCH = 5000
+
+
+class OfferIndex:
+    """
+    Persistent offer ID -> (link, link file, detail file, fetch status, listing metadata) index in
+    SQLite. Link and detail files are indexed incrementally: a file whose size and mtime did not
+    change since the last run is not read again, so "which offers still need details?" is a lookup.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS offers (
+                offer_id TEXT PRIMARY KEY,
+                link TEXT,
+                links_file TEXT,
+                details_file TEXT,
+                status TEXT NOT NULL,
+                meta TEXT,
+                updated_at REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS offers_links_file ON offers (links_file, status)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                records INTEGER NOT NULL
+            )
+            """
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _upsert(self, kind, path, records):
+        now = time.time()
+        if kind == LINKS:
+            sql = (
+                "INSERT INTO offers (offer_id, link, links_file, status, meta, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(offer_id) DO UPDATE SET link = excluded.link, links_file = excluded.links_file, "
+                "meta = excluded.meta, updated_at = excluded.updated_at"
+            )
+            rows = [(offer_id(r.get("link")), r.get("link"), path, PENDING, json.dumps(r, ensure_ascii=False), now)
+                    for r in records]
+        else:
+            sql = (
+                "INSERT INTO offers (offer_id, link, details_file, status, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(offer_id) DO UPDATE SET details_file = excluded.details_file, "
+                "status = excluded.status, updated_at = excluded.updated_at"
+            )
+            rows = [(offer_id(r.get("url")), r.get("url"), path, DONE, now) for r in records]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(sql, rows)
+            self._conn.execute("COMMIT")
+
+    def index_file(self, path, kind):
+        """Index one link or detail file (JSON array or NDJSON); returns the records read, 0 if unchanged."""
+        if kind not in (LINKS, DETAILS):
+            raise ValueError(f"Unknown file kind: {kind}")
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime FROM files WHERE path = ?", (path,)).fetchone()
+        if row == (stat.st_size, stat.st_mtime):
+            return 0
+
+        key = "link" if kind == LINKS else "url"
+        records = 0
+        batch = []
+        for record in iter_records(path):
+            if not record.get(key):
+                continue
+            batch.append(record)
+            if len(batch) >= BATCH:
+                self._upsert(kind, path, batch)
+                records += len(batch)
+                batch = []
+        if batch:
+            self._upsert(kind, path, batch)
+            records += len(batch)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, kind, size, mtime, records) VALUES (?, ?, ?, ?, ?)",
+                (path, kind, stat.st_size, stat.st_mtime, records),
+            )
+        return records
+
+    def mark(self, url, status, details_file=None):
+        """Record the fetch outcome of one offer as it happens."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO offers (offer_id, link, details_file, status, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(offer_id) DO UPDATE SET status = excluded.status, "
+                "details_file = COALESCE(excluded.details_file, details_file), updated_at = excluded.updated_at",
+                (offer_id(url), url, details_file, status, time.time()),
+            )
+
+    def mark_many(self, urls, status, details_file=None):
+        """``mark`` for many URLs in one transaction."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO offers (offer_id, link, details_file, status, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(offer_id) DO UPDATE SET status = excluded.status, "
+                "details_file = COALESCE(excluded.details_file, details_file), updated_at = excluded.updated_at",
+                ((offer_id(url), url, details_file, status, now) for url in urls),
+            )
+            self._conn.execute("COMMIT")
+
+    def lookup(self, url):
+        """Index entry for ``url`` as a dict, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT offer_id, link, links_file, details_file, status FROM offers WHERE offer_id = ?",
+                (offer_id(url),),
+            ).fetchone()
+        if not row:
+            return None
+        return dict(zip(("offer_id", "link", "links_file", "details_file", "status"), row))
+
+    def has_details(self, url):
+        entry = self.lookup(url)
+        return bool(entry and entry["status"] == DONE)
+
+    def missing(self, links_data):
+        """Entries of ``links_data`` whose offer has no details yet."""
+        ids = [offer_id(item.get("link")) for item in links_data]
+        done = set()
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            with self._lock:
+                done.update(row[0] for row in self._conn.execute(
+                    f"SELECT offer_id FROM offers WHERE status = ? AND offer_id IN ({','.join('?' * len(chunk))})",
+                    [DONE, *chunk],
+                ))
+        return [item for item, key in zip(links_data, ids) if key not in done]
+
+    def work_queue(self, links_file=None, include_failed=True):
+        """Listing metadata of every indexed offer (optionally of one link file) still lacking details."""
+        statuses = (PENDING, FAILED) if include_failed else (PENDING,)
+        sql = f"SELECT meta FROM offers WHERE meta IS NOT NULL AND status IN ({','.join('?' * len(statuses))})"
+        params = list(statuses)
+        if links_file:
+            sql += " AND links_file = ?"
+            params.append(os.path.abspath(links_file))
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY offer_id", params).fetchall()
+        return [json.loads(meta) for meta, in rows]
+
+    def counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM offers GROUP BY status").fetchall())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or refresh the offer-ID index.")
+    parser.add_argument("index", help="SQLite index file")
+    parser.add_argument("--links", nargs="*", default=[], help="link files (JSON array or NDJSON)")
+    parser.add_argument("--details", nargs="*", default=[], help="detail files (JSON array or NDJSON)")
+    args = parser.parse_args()
+
+    with OfferIndex(args.index) as index:
+        for kind, paths in ((LINKS, args.links), (DETAILS, args.details)):
+            for path in paths:
+                records = index.index_file(path, kind)
+                print(f"🗂️ {path}: {records} records indexed" if records else f"⏭️ {path}: unchanged")
+        print(f"📊 {index.counts()}")
@@ -0,0 +1,290 @@
+"""
+Run the scraping stages back to back from a JSON manifest instead of editing each module's __main__.
+
+Usage:
+    python pipeline.py pipeline.example.json
+    python pipeline.py pipeline.example.json --stages merge,filter --years 2023-2024
+    python pipeline.py pipeline.example.json --dry-run
+    python pipeline.py pipeline.example.json --stages merge_shards
+
+Stages, in order:
+    links    monthly link files      -> <data_dir>/links/<year>/pracujpl_links_<year>_<month>.json
+    merge    one deduplicated file   -> <data_dir>/merged/pracujpl_links_<year>_all.json
+    filter   keyword-filtered file   -> <data_dir>/merged/pracujpl_links_<year>_all_filtered_v2.json
+    details  offer details           -> <data_dir>/details/details_<year-month>.<format>
+    merge_shards (only on request)   -> per-shard detail files folded into details_<year>.<format>
+
+With details.queue_path (instead of details.shard) every node enqueues the yearly link files into one shared work queue and
+then works through it; the yearly files are collected with the threads backend unless another
+non-scheduled backend is set. Once all shard nodes are done, one node runs merge_shards.
+
+With details.compact the ndjson outputs of the manifest's years are rewritten without duplicate
+records after details and merge_shards; details.parquet also exports each of them to .parquet.
+
+When merge and filter run together the filter is applied inside the merge, so the unfiltered
+yearly file is never written and read back (set "keep_unfiltered" to still get it).
+"""
+import argparse
+import copy
+import json
+import os
+import time
+from glob import glob
+
+from details_extractor import (
+    collect_job_details_from_links,
+    collect_job_details_from_queue,
+    collect_job_details_scheduled,
+    enqueue_link_files,
+    iter_link_months,
+    merge_shard_outputs,
+)
+from job_selector import OfferFilter, filter_json
+from json_stream import compact, export_parquet
+from job_selector import keywords as DEFAULT_KEYWORDS
+from json_merge import merge_yearly_files
+from link_extractor import collect_links_all_years
+from metrics import METRICS
+from rate_limiter import RATE_CONTROLLER
+from work_queue import parse_shard
+
+STAGES = ("links", "merge", "filter", "details", "merge_shards")
+
+DEFAULTS = {
+    "data_dir": "data",
+    "stages": ["links", "merge", "filter", "details"],
+    "years": {"start": 2017, "end": 2025},
+    "rate_limit": {},
+    "metrics_path": None,
+    "links": {"max_workers": 12, "page_workers": 4, "shard": None, "queue_path": None},
+    "filter": {"keywords": None, "annotate": False, "keep_unfiltered": False},
+    "details": {
+        "backend": "scheduled",
+        "links_suffix": "_all_filtered_v2",
+        "skip_months": [],
+        "max_workers": 20,
+        "parser": "bs4",
+        "output_format": "ndjson",
+        "queue_path": None,
+        "compact": False,
+        "parquet": False,
+    },
+}
+
+# Manifest options holding paths; relative ones are taken relative to data_dir.
+PATH_OPTIONS = ("queue_path", "journal_path", "cache_dir", "archive_dir", "index_path", "metrics_path")
+
+
+def load_manifest(path):
+    """Read a manifest and fill in defaults; ``data_dir`` is resolved relative to the manifest file."""
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    unknown = set(manifest) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown manifest keys: {', '.join(sorted(unknown))}")
+    merged = copy.deepcopy(DEFAULTS)
+    for key, value in manifest.items():
+        if isinstance(merged[key], dict) and key != "years":
+            merged[key].update(value)
+        else:
+            merged[key] = value
+
+    bad = [stage for stage in merged["stages"] if stage not in STAGES]
+    if bad:
+        raise ValueError(f"Unknown stages: {', '.join(bad)} (expected some of {', '.join(STAGES)})")
+    merged["data_dir"] = os.path.join(os.path.dirname(os.path.abspath(path)), merged["data_dir"])
+    return merged
+
+
+def resolve_paths(options, data_dir):
+    return {key: os.path.join(data_dir, value) if key in PATH_OPTIONS and value else value
+            for key, value in options.items()}
+
+
+def years_of(manifest):
+    return range(manifest["years"]["start"], manifest["years"]["end"] + 1)
+
+
+def links_dir(manifest):
+    return os.path.join(manifest["data_dir"], "links")
+
+
+def merged_dir(manifest):
+    return os.path.join(manifest["data_dir"], "merged")
+
+
+def details_dir(manifest):
+    return os.path.join(manifest["data_dir"], "details")
+
+
+def merged_file(manifest, year, suffix):
+    return os.path.join(merged_dir(manifest), f"pracujpl_links_{year}{suffix}.json")
+
+
+def offer_filter(manifest):
+    options = manifest["filter"]
+    return OfferFilter(options["keywords"] or DEFAULT_KEYWORDS, options["annotate"])
+
+
+def run_links(manifest):
+    options = resolve_paths(manifest["links"], manifest["data_dir"])
+    years = years_of(manifest)
+    collect_links_all_years(
+        years.start, years.stop - 1,
+        max_workers=options["max_workers"],
+        page_workers=options["page_workers"],
+        shard=parse_shard(options["shard"]) if options["shard"] else None,
+        queue_path=options["queue_path"],
+        output_dir=links_dir(manifest),
+    )
+
+
+def run_merge(manifest, fused_filter=False):
+    years = list(years_of(manifest))
+    if fused_filter:
+        select = offer_filter(manifest)
+        merge_yearly_files(links_dir(manifest), merged_dir(manifest), years=years, select=select,
+                           suffix=manifest["details"]["links_suffix"])
+        print(f"🔎 Kept {select.kept} offers; top keywords: {select.top_keywords()}")
+    else:
+        merge_yearly_files(links_dir(manifest), merged_dir(manifest), years=years)
+
+
+def run_filter(manifest):
+    select = offer_filter(manifest)
+    for year in years_of(manifest):
+        input_file = merged_file(manifest, year, "_all")
+        if not os.path.exists(input_file):
+            print(f"🚫 Missing file: {input_file}")
+            continue
+        filter_json(input_file, merged_file(manifest, year, manifest["details"]["links_suffix"]), select.matcher,
+                    annotate=select.annotate)
+
+
+def run_details(manifest):
+    options = resolve_paths(manifest["details"], manifest["data_dir"])
+    backend = options.pop("backend")
+    suffix = options.pop("links_suffix")
+    skip_months = set(options.pop("skip_months"))
+    queue_path = options.pop("queue_path")
+    options.pop("compact")
+    options.pop("parquet")
+    if queue_path and options.get("shard"):
+        # A queued yearly file is handled by one node, so a shard filter would drop the other shards.
+        raise ValueError("details: set either shard or queue_path, not both")
+    if options.get("shard"):
+        options["shard"] = parse_shard(options["shard"])
+    output_dir = details_dir(manifest)
+    links_files = [merged_file(manifest, year, suffix) for year in years_of(manifest)]
+
+    if backend == "scheduled":
+        if not queue_path:
+            # Months of every year share one thread pool; each yearly file is read once, as a stream.
+            collect_job_details_scheduled(iter_link_months(links_files, skip_months), output_dir, **options)
+            return
+        print("⚠️ The details queue hands out yearly link files; using the threads backend for them")
+        backend = "threads"
+    if skip_months:
+        print(f"⚠️ skip_months is only applied by the scheduled backend, not {backend}")
+    if queue_path:
+        enqueue_link_files(queue_path, zip(years_of(manifest), links_files))
+        collect_job_details_from_queue(queue_path, output_dir, backend=backend, **options)
+        return
+    for year, links_file in zip(years_of(manifest), links_files):
+        if not os.path.exists(links_file):
+            print(f"🚫 Missing file: {links_file}")
+            continue
+        collect_job_details_from_links(year, links_file, output_dir, backend=backend, **options)
+
+
+def run_merge_shards(manifest):
+    """Fold the per-shard detail files of the manifest's years (or months) into one file each."""
+    output_format = manifest["details"]["output_format"]
+    years = {str(year) for year in years_of(manifest)}
+    pattern = os.path.join(details_dir(manifest), f"details_*.shard-*-of-*.{output_format}")
+    keys = sorted({os.path.basename(path)[len("details_"):].split(".shard-")[0] for path in glob(pattern)
+                   if not path.endswith(".spool.ndjson")})
+    keys = [key for key in keys if key[:4] in years]
+    if not keys:
+        print(f"🚫 No shard outputs in {details_dir(manifest)}")
+    for key in keys:
+        merge_shard_outputs(details_dir(manifest), key, output_format)
+
+
+def finish_details(manifest):
+    """Compact and/or export to Parquet the ndjson detail files of the manifest's years."""
+    options = manifest["details"]
+    if not (options["compact"] or options["parquet"]):
+        return
+    if options["output_format"] != "ndjson":
+        print("⚠️ details.compact and details.parquet only apply to the ndjson output format")
+        return
+    for year in years_of(manifest):
+        for path in sorted(glob(os.path.join(details_dir(manifest), f"details_{year}*.ndjson"))):
+            if path.endswith(".spool.ndjson"):
+                continue
+            if options["compact"]:
+                compact(path)
+            if options["parquet"]:
+                parquet_path = path[:-len(".ndjson")] + ".parquet"
+                export_parquet(path, parquet_path)
+                print(f"📦 Exported {path} → {parquet_path}")
+
+
+def run(manifest):
+    stages = manifest["stages"]
+    if manifest["rate_limit"]:
+        RATE_CONTROLLER.configure(**manifest["rate_limit"])
+    fused = "merge" in stages and "filter" in stages and not manifest["filter"]["keep_unfiltered"]
+
+    for stage in STAGES:
+        if stage not in stages or (stage == "filter" and fused):
+            continue
+        print(f"▶️ Stage {stage}" + (" + filter" if stage == "merge" and fused else ""))
+        start = time.time()
+        if stage == "links":
+            run_links(manifest)
+        elif stage == "merge":
+            run_merge(manifest, fused_filter=fused)
+        elif stage == "filter":
+            run_filter(manifest)
+        elif stage == "details":
+            run_details(manifest)
+            finish_details(manifest)
+        else:
+            run_merge_shards(manifest)
+            finish_details(manifest)
+        print(f"⏱️ Stage {stage} done in {time.time() - start:.1f} s")
+
+    if manifest["metrics_path"]:
+        METRICS.write(os.path.join(manifest["data_dir"], manifest["metrics_path"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the pracuj.pl scraping pipeline from a JSON manifest.")
+    parser.add_argument("manifest", help="pipeline manifest (see pipeline.example.json)")
+    parser.add_argument("--stages", help=f"comma-separated subset of {','.join(STAGES)}, overrides the manifest")
+    parser.add_argument("--years", help="START-END (e.g. 2023-2024), overrides the manifest")
+    parser.add_argument("--dry-run", action="store_true", help="print the resolved manifest and exit")
+    args = parser.parse_args(argv)
+
+    manifest = load_manifest(args.manifest)
+    if args.stages:
+        manifest["stages"] = args.stages.split(",")
+        bad = [stage for stage in manifest["stages"] if stage not in STAGES]
+        if bad:
+            parser.error(f"unknown stages: {', '.join(bad)}")
+    if args.years:
+        start, _, end = args.years.partition("-")
+        manifest["years"] = {"start": int(start), "end": int(end or start)}
+
+    if args.dry_run:
+        print(json.dumps(manifest, ensure_ascii=False, indent=2))
+        return
+    os.makedirs(manifest["data_dir"], exist_ok=True)
+    run(manifest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+THROTTLE_STATUSES = (429, 503)
+# Only successful answers speed a host up; a 403 challenge or a 404 leaves the rate where it is.
+HEALTHY_STATUSES = frozenset(range(200, 300)) | {304}
+
+INITIAL_RATE = 5.0
+MIN_RATE = 0.5
+MAX_RATE = 50.0
+BURST = 5
+INCREASE = 1.0
+DECREASE = 0.5
+DEFAULT_PAUSE = (0.8, 1.5)
+
+SETTINGS = ("initial_rate", "min_rate", "max_rate", "burst", "increase", "decrease")
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _HostState:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+
+class AdaptiveRateController:
+    """
+    Per-host token bucket whose refill rate follows AIMD: every healthy response adds
+    roughly ``increase`` requests/sec per second of traffic, every 429/503 multiplies the
+    rate by ``decrease`` and pauses the host for all callers (honouring Retry-After).
+    """
+
+    def __init__(self, initial_rate=INITIAL_RATE, min_rate=MIN_RATE, max_rate=MAX_RATE, burst=BURST,
+                 increase=INCREASE, decrease=DECREASE):
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self.configure(initial_rate=initial_rate, min_rate=min_rate, max_rate=max_rate, burst=burst,
+                       increase=increase, decrease=decrease)
+
+    def configure(self, **settings):
+        for name, value in settings.items():
+            if name not in SETTINGS:
+                raise ValueError(f"Unknown rate controller setting: {name}")
+            setattr(self, name, value)
+        with self._lock:
+            self._hosts.clear()
+
+    def _state(self, url):
+        host = urlsplit(url).hostname or ""
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.initial_rate, self.burst)
+        return state
+
+    def reserve(self, url):
+        """Take a token for ``url``'s host and return how long the caller has to wait before sending."""
+        with self._lock:
+            state = self._state(url)
+            now = time.monotonic()
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+            state.updated = now
+            state.tokens -= 1
+            wait = -state.tokens / state.rate if state.tokens < 0 else 0.0
+            return max(wait, state.paused_until - now)
+
+    def acquire(self, url):
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, url):
+        delay = self.reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def record(self, url, status, retry_after=None):
+        """Feed a response status (and its Retry-After header) back into the controller."""
+        with self._lock:
+            state = self._state(url)
+            if status in THROTTLE_STATUSES:
+                state.rate = max(self.min_rate, state.rate * self.decrease)
+                pause = parse_retry_after(retry_after)
+                if pause is None:
+                    pause = random.uniform(*DEFAULT_PAUSE)
+                state.paused_until = max(state.paused_until, time.monotonic() + pause)
+                state.tokens = min(state.tokens, 0)
+            elif status in HEALTHY_STATUSES:
+                state.rate = min(self.max_rate, state.rate + self.increase / state.rate)
+
+    def rate(self, url):
+        with self._lock:
+            return self._state(url).rate
+
+
+RATE_CONTROLLER = AdaptiveRateController()
@@ -0,0 +1,167 @@
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import cloudscraper
+
+POOL_SIZE = 32
+CONNECTIONS_PER_SESSION = 4
+MAX_REQUESTS_PER_SESSION = 2000
+MAX_SESSION_AGE = 30 * 60
+MAX_CONSECUTIVE_FAILURES = 3
+# 403 from archiwum.pracuj.pl means the Cloudflare clearance of the session is no longer accepted.
+UNHEALTHY_STATUSES = (403,)
+
+USER_AGENTS = [
+    (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/117.0.0.0 Safari/537.36"
+    ),
+    (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+        "AppleWebKit/605.1.15 (KHTML, like Gecko) "
+        "Version/16.0 Safari/605.1.15"
+    ),
+    (
+        "Mozilla/5.0 (X11; Linux x86_64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/116.0.0.0 Safari/537.36"
+    ),
+    (
+        "Mozilla/5.0 (iPhone; CPU iPhone OS 16_4 like Mac OS X) "
+        "AppleWebKit/605.1.15 (KHTML, like Gecko) "
+        "Version/16.4 Mobile/15E148 Safari/604.1"
+    ),
+]
+
+
+def make_scraper(connections=CONNECTIONS_PER_SESSION):
+    scraper = cloudscraper.create_scraper()
+    scraper.headers.update(
+        {
+            "User-Agent": random.choice(USER_AGENTS),
+            "Accept": "*/*",
+            "Connection": "keep-alive",
+        }
+    )
+    # Keep cloudscraper's TLS fingerprint (cipher suite, curve, SSL context) and only resize its pool;
+    # retries are handled by the callers and the rate controller, not by urllib3.
+    adapter = cloudscraper.CipherSuiteAdapter(
+        cipherSuite=scraper.cipherSuite,
+        ecdhCurve=scraper.ecdhCurve,
+        server_hostname=scraper.server_hostname,
+        source_address=scraper.source_address,
+        ssl_context=scraper.ssl_context,
+        pool_connections=connections,
+        pool_maxsize=connections,
+        max_retries=0,
+    )
+    scraper.mount("https://", adapter)
+    scraper.mount("http://", adapter)
+    return scraper
+
+
+class PooledSession:
+    """A pooled scraper that tracks its own age, use count and health."""
+
+    def __init__(self, scraper):
+        self.scraper = scraper
+        self.created = time.monotonic()
+        self.requests = 0
+        self.failures = 0
+
+    def get(self, url, **kwargs):
+        self.requests += 1
+        try:
+            resp = self.scraper.get(url, **kwargs)
+        except Exception:
+            self.failures += 1
+            raise
+        if resp.status_code in UNHEALTHY_STATUSES:
+            self.failures += 1
+        else:
+            self.failures = 0
+        return resp
+
+    @property
+    def headers(self):
+        return self.scraper.headers
+
+    @property
+    def cookies(self):
+        return self.scraper.cookies
+
+    def close(self):
+        try:
+            self.scraper.close()
+        except Exception:
+            pass
+
+
+class SessionPool:
+    """
+    Bounded pool of keep-alive cloudscraper sessions. A session that solved the Cloudflare
+    challenge is handed out again and again, and is only recycled once it is too old, has
+    served too many requests or keeps failing.
+    """
+
+    def __init__(self, size=POOL_SIZE, factory=make_scraper, max_requests=MAX_REQUESTS_PER_SESSION,
+                 max_age=MAX_SESSION_AGE, max_failures=MAX_CONSECUTIVE_FAILURES):
+        self.size = size
+        self.factory = factory
+        self.max_requests = max_requests
+        self.max_age = max_age
+        self.max_failures = max_failures
+        # LIFO keeps the warmest sessions in use and lets idle ones age out at the bottom.
+        self._idle = queue.LifoQueue()
+        self._leases = threading.BoundedSemaphore(size)
+
+    def _healthy(self, pooled):
+        return (
+            pooled.failures < self.max_failures
+            and pooled.requests < self.max_requests
+            and time.monotonic() - pooled.created < self.max_age
+        )
+
+    def acquire(self):
+        self._leases.acquire()
+        try:
+            while True:
+                try:
+                    pooled = self._idle.get_nowait()
+                except queue.Empty:
+                    return PooledSession(self.factory())
+                if self._healthy(pooled):
+                    return pooled
+                pooled.close()
+        except Exception:
+            self._leases.release()
+            raise
+
+    def release(self, pooled):
+        if self._healthy(pooled):
+            self._idle.put(pooled)
+        else:
+            pooled.close()
+        self._leases.release()
+
+    @contextmanager
+    def session(self):
+        pooled = self.acquire()
+        try:
+            yield pooled
+        finally:
+            self.release(pooled)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+SESSION_POOL = SessionPool()
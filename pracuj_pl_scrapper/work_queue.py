@@ -0,0 +1,188 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+LEASE_SECONDS = 15 * 60
+MAX_ATTEMPTS = 3
+
+
+def shard_of(key, shards):
+    """Stable shard number of ``key``: the same on every machine and Python process, unlike hash()."""
+    return zlib.crc32(key.encode("utf-8")) % shards
+
+
+def parse_shard(spec):
+    """Parse "index/count" (e.g. "2/8") into a validated (index, count) tuple."""
+    index, count = (int(part) for part in spec.split("/"))
+    if not 0 <= index < count:
+        raise ValueError(f"Shard index must be in [0, {count}): {spec}")
+    return index, count
+
+
+def default_owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+class WorkQueue:
+    """
+    Prioritized work queue with a lease/ack protocol in SQLite. A worker leases items, which
+    become invisible to other workers until they are acked, nacked or the lease expires (a crashed
+    node's work is handed out again). Any replacement only needs put / lease / ack / nack / counts.
+    """
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS items (
+                key TEXT PRIMARY KEY,
+                priority INTEGER NOT NULL DEFAULT 0,
+                payload TEXT,
+                status TEXT NOT NULL,
+                owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS items_ready ON items (status, priority DESC, key)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _fail_expired(self, now):
+        """Items whose lease expired on their last allowed attempt will never be leased again."""
+        self._conn.execute(
+            "UPDATE items SET status = ?, lease_expires = NULL, updated_at = ? "
+            "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+            (FAILED, now, LEASED, now, self.max_attempts),
+        )
+
+    def put(self, items, priority=0):
+        """Enqueue ``(key, payload)`` pairs; keys already in the queue are left untouched."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO items (key, priority, payload, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                ((key, priority, json.dumps(payload, ensure_ascii=False), QUEUED, now) for key, payload in items),
+            )
+            self._conn.execute("COMMIT")
+
+    def lease(self, owner, n=1):
+        """Lease up to ``n`` ready items (highest priority first) as ``(key, payload)`` pairs."""
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so two processes never lease the same item.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._fail_expired(now)
+                rows = self._conn.execute(
+                    "SELECT key, payload FROM items WHERE attempts < ? AND "
+                    "(status = ? OR (status = ? AND lease_expires < ?)) "
+                    "ORDER BY priority DESC, key LIMIT ?",
+                    (self.max_attempts, QUEUED, LEASED, now, n),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE items SET status = ?, owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE key = ?",
+                    ((LEASED, owner, now + self.lease_seconds, now, key) for key, _ in rows),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [(key, json.loads(payload)) for key, payload in rows]
+
+    def ack(self, key, owner):
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE items SET status = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE key = ? AND owner = ? AND status = ?",
+                (DONE, time.time(), key, owner, LEASED),
+            )
+        # False means the lease expired and the item was handed to someone else meanwhile.
+        return cur.rowcount == 1
+
+    def nack(self, key, owner):
+        """Give a leased item back; after ``max_attempts`` leases it is marked failed instead."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE items SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, lease_expires = NULL, "
+                "updated_at = ? WHERE key = ? AND owner = ? AND status = ?",
+                (self.max_attempts, FAILED, QUEUED, time.time(), key, owner, LEASED),
+            )
+        return cur.rowcount == 1
+
+    def extend(self, key, owner):
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE items SET lease_expires = ? WHERE key = ? AND owner = ? AND status = ?",
+                (time.time() + self.lease_seconds, key, owner, LEASED),
+            )
+        return cur.rowcount == 1
+
+    def counts(self):
+        with self._lock:
+            self._fail_expired(time.time())
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall())
+
+
+def _keep_leased(queue, key, owner, stop):
+    """Heartbeat: extend the lease on ``key`` every third of its length until ``stop`` is set."""
+    while not stop.wait(queue.lease_seconds / 3):
+        if not queue.extend(key, owner):
+            print(f"⚠️ Lease on {key} was lost by {owner}")
+            return
+
+
+def drain(queue, handle, owner=None):
+    """
+    Lease items one by one and run ``handle(payload)`` until the queue has nothing ready. The lease
+    is extended in the background while ``handle`` runs, so long items are not handed out twice.
+    """
+    owner = owner or default_owner()
+    handled = 0
+    while True:
+        leased = queue.lease(owner)
+        if not leased:
+            return handled
+        key, payload = leased[0]
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=_keep_leased, args=(queue, key, owner, stop), daemon=True)
+        heartbeat.start()
+        try:
+            handle(payload)
+        except Exception as e:
+            print(f"❌ {key} failed on {owner}: {e}")
+            queue.nack(key, owner)
+            continue
+        finally:
+            stop.set()
+            heartbeat.join()
+        if queue.ack(key, owner):
+            handled += 1
+        else:
+            print(f"⚠️ {key} finished on {owner} after its lease was lost; not counted")
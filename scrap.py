@@ -1,11 +1,104 @@
 import fitz  # PyMuPDF
+import bisect
+import hashlib
+import itertools
+import os
 import re
 import json
+import sqlite3
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 def extract_text_from_pdf(pdf_path):
-    doc = fitz.open(pdf_path)
-    return "\n".join([page.get_text() for page in doc])
+    with fitz.open(pdf_path) as doc:
+        return "\n".join(page.get_text() for page in doc)
+
+def file_sha256(pdf_path):
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class TextCache:
+    """
+    Pamięć podręczna tekstu wyciągniętego z kart (SQLite obok PDF-ów, tekst skompresowany zlib).
+    Wpis jest ważny, gdy zgadza się rozmiar i mtime pliku; przy innym mtime (np. po skopiowaniu)
+    decyduje skrót SHA-256. Zmiana wersji PyMuPDF unieważnia wszystkie wpisy.
+    """
+
+    def __init__(self, path, extractor=fitz.VersionBind):
+        self.path = path
+        self.extractor = extractor
+        self.hits = 0
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS texts (
+                name TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                sha256 TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                text BLOB NOT NULL,
+                updated_at REAL
+            )
+            """
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def is_current(self, pdf_path):
+        """Czy wpis karty ma jej rozmiar i mtime - bez rozpakowywania tekstu i liczenia skrótu."""
+        stat = os.stat(pdf_path)
+        row = self._conn.execute(
+            "SELECT size, mtime FROM texts WHERE name = ? AND extractor = ?", (pdf_path.name, self.extractor)
+        ).fetchone()
+        return row == (stat.st_size, stat.st_mtime)
+
+    def get(self, pdf_path):
+        """Tekst karty z pamięci albo None, gdy plik jest nowy lub się zmienił."""
+        stat = os.stat(pdf_path)
+        row = self._conn.execute(
+            "SELECT size, mtime, sha256, text FROM texts WHERE name = ? AND extractor = ?",
+            (pdf_path.name, self.extractor),
+        ).fetchone()
+        if not row or row[0] != stat.st_size:
+            return None
+        size, mtime, sha256, text = row
+        if mtime != stat.st_mtime:
+            if file_sha256(pdf_path) != sha256:
+                return None
+            self._conn.execute("UPDATE texts SET mtime = ? WHERE name = ?", (stat.st_mtime, pdf_path.name))
+        self.hits += 1
+        return zlib.decompress(text).decode("utf-8")
+
+    def put(self, pdf_path, text):
+        stat = os.stat(pdf_path)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO texts (name, size, mtime, sha256, extractor, text, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (pdf_path.name, stat.st_size, stat.st_mtime, file_sha256(pdf_path), self.extractor,
+             zlib.compress(text.encode("utf-8"), 6), time.time()),
+        )
+
+    def evict(self, names):
+        """Usuwa wpisy kart, których nie ma już w folderze; zwraca liczbę usuniętych."""
+        names = set(names)
+        stale = [name for name, in self._conn.execute("SELECT name FROM texts") if name not in names]
+        self._conn.executemany("DELETE FROM texts WHERE name = ?", ((name,) for name in stale))
+        return len(stale)
 
 def parse_formy_zajec(section_text):
     lines = section_text.splitlines()
@@ -32,32 +125,80 @@ def parse_formy_zajec(section_text):
 
     return formy_dict
 
-def extract_section(text, section_title, stop_titles):
-    lines = text.splitlines()
-    capturing = False
-    collected = []
-
-    for line in lines:
-        if section_title.lower() in line.lower():
-            capturing = True
-            continue
-        if capturing and any(stop.lower() in line.lower() for stop in stop_titles):
-            break
-        if capturing:
-            collected.append(line.strip())
+FIELD_PATTERNS = {
+    'nazwa_kod': re.compile(r'Nazwa i kod przedmiotu\s+(.+)'),
+    'kierunek': re.compile(r'Kierunek studiów\s+(.+)'),
+    'poziom_ksztalcenia': re.compile(r'Poziom kształcenia\s+(.+)'),
+    'rok': re.compile(r'Rok studiów\s+(\d+)'),
+    'semestr': re.compile(r'Semestr studiów\s+(\d+)'),
+    'jezyk': re.compile(r'Język wykładowy\s+(.+)'),
+    'forma_studiow': re.compile(r'Forma studiów\s+(.+)'),
+    'jednostka_prowadzaca': re.compile(r'Jednostka prowadząca\s+(.+)'),
+}
+EFEKT_POMIJANE_RE = re.compile(r'(?i)(efekt kierunkowy|efekt z przedmiotu|sposób weryfikacji|oceny efektu|przedmiotu)')
+
+class CardText:
+    """
+    Tekst karty podzielony raz na linie i raz zamieniony na małe litery. Numery linii
+    zawierających daną frazę są wyszukiwane jednym przebiegiem po tekście i zapamiętywane,
+    więc kolejne sekcje nie skanują już całego dokumentu.
+    """
+
+    def __init__(self, text):
+        self.lines = text.splitlines()
+        lowered = [line.lower() for line in self.lines]
+        self._text = "\n".join(lowered)
+        self._starts = list(itertools.accumulate((len(line) + 1 for line in lowered), initial=0))
+        self._hits = {}
+
+    def lines_with(self, phrase):
+        """Rosnące numery linii zawierających ``phrase`` (bez rozróżniania wielkości liter)."""
+        phrase = phrase.lower()
+        found = self._hits.get(phrase)
+        if found is None:
+            found = self._hits[phrase] = []
+            pos = self._text.find(phrase)
+            while pos != -1:
+                line_no = bisect.bisect_right(self._starts, pos) - 1
+                found.append(line_no)
+                pos = self._text.find(phrase, self._starts[line_no + 1])
+        return found
+
+    def section(self, section_title, stop_titles):
+        """
+        Linie od pierwszej linii z tytułem do pierwszej linii z tytułem końcowym. Linie z tytułem
+        są pomijane i nigdy nie kończą sekcji, jak przy przeglądaniu linia po linii.
+        """
+        title_lines = self.lines_with(section_title)
+        if not title_lines:
+            return ""
+        first = title_lines[0]
+        title_set = set(title_lines)
+        end = len(self.lines)
+        for stop in stop_titles:
+            stop_lines = self.lines_with(stop)
+            for line_no in stop_lines[bisect.bisect_right(stop_lines, first):]:
+                if line_no >= end:
+                    break
+                if line_no not in title_set:
+                    end = line_no
+                    break
+        collected = [self.lines[i].strip() for i in range(first + 1, end) if i not in title_set]
+        return "\n".join(collected).strip()
 
-    return "\n".join(collected).strip()
+def extract_section(text, section_title, stop_titles):
+    return CardText(text).section(section_title, stop_titles)
 
 def parse_course_info(text):
     data = {}
 
-    lines = text.splitlines()
+    card = CardText(text)
 
-    def safe_search(pattern):
-        match = re.search(pattern, text)
+    def safe_search(field):
+        match = FIELD_PATTERNS[field].search(text)
         return match.group(1).strip() if match else None
 
-    przedmiot_nazwa_kod = safe_search(r'Nazwa i kod przedmiotu\s+(.+)')
+    przedmiot_nazwa_kod = safe_search('nazwa_kod')
 
     if przedmiot_nazwa_kod:
         parts = przedmiot_nazwa_kod.rsplit(' ', 1)
@@ -67,49 +208,49 @@ def parse_course_info(text):
         data['nazwa_przedmiotu'] = None
         data['kod_przedmiotu'] = None
 
-    data['kierunek'] = safe_search(r'Kierunek studiów\s+(.+)')
-    data['poziom_ksztalcenia'] = safe_search(r'Poziom kształcenia\s+(.+)')
-    data['rok_akademicki'] = extract_section(
-        text, "Rok akademicki", ["Poziom kształcenia"]
+    data['kierunek'] = safe_search('kierunek')
+    data['poziom_ksztalcenia'] = safe_search('poziom_ksztalcenia')
+    data['rok_akademicki'] = card.section(
+        "Rok akademicki", ["Poziom kształcenia"]
     )
-    data['rok'] = safe_search(r'Rok studiów\s+(\d+)')
-    data['semestr'] = safe_search(r'Semestr studiów\s+(\d+)')
-    data['jezyk'] = safe_search(r'Język wykładowy\s+(.+)')
-    data['forma_studiow'] = safe_search(r'Forma studiów\s+(.+)')
-    data['jednostka_prowadzaca'] = safe_search(r'Jednostka prowadząca\s+(.+)')
-
-    data['cel_przedmiotu'] = extract_section(
-        text, "Cel przedmiotu", ["Efekty uczenia się", "Efekt kierunkowy", "Data wygenerowania"]
+    data['rok'] = safe_search('rok')
+    data['semestr'] = safe_search('semestr')
+    data['jezyk'] = safe_search('jezyk')
+    data['forma_studiow'] = safe_search('forma_studiow')
+    data['jednostka_prowadzaca'] = safe_search('jednostka_prowadzaca')
+
+    data['cel_przedmiotu'] = card.section(
+        "Cel przedmiotu", ["Efekty uczenia się", "Efekt kierunkowy", "Data wygenerowania"]
     )
 
-    efekty_raw = extract_section(
-        text, "Efekty uczenia się", ["Treści przedmiotu", "Wymagania wstępne"]
+    efekty_raw = card.section(
+        "Efekty uczenia się", ["Treści przedmiotu", "Wymagania wstępne"]
     )
     efekt_linie = efekty_raw.splitlines()
     efekt_linie_czyste = [
         line for line in efekt_linie
-        if not re.match(r'(?i)(efekt kierunkowy|efekt z przedmiotu|sposób weryfikacji|oceny efektu|przedmiotu)', line.strip())
+        if not EFEKT_POMIJANE_RE.match(line.strip())
     ]
     data['efekty_uczenia_sie'] = " ".join(efekt_linie_czyste).strip()
 
-    data['tresc_przedmiotu'] =  extract_section(
-        text, "Treści przedmiotu", ["Wymagania wstępne", "Sposoby i kryteria"]
+    data['tresc_przedmiotu'] = card.section(
+        "Treści przedmiotu", ["Wymagania wstępne", "Sposoby i kryteria"]
     )
 
-    formy_section = extract_section(text, "Forma zajęć", ["W tym liczba"])
+    formy_section = card.section("Forma zajęć", ["W tym liczba"])
     formy_dict = parse_formy_zajec(formy_section)
     data['formy_zajec'] = "\n".join(f"{k}: {v}" for k, v in formy_dict.items())
 
-    data['wymagania_wstepne'] = extract_section(
-        text, "Wymagania wstępne", ["Sposoby i kryteria", "Data wygenerowania"]
+    data['wymagania_wstepne'] = card.section(
+        "Wymagania wstępne", ["Sposoby i kryteria", "Data wygenerowania"]
     )
 
-    data['lista_lektur'] = extract_section(
-        text, "Zalecana lista lektur", ["Adresy eZasobów", "Data wygenerowania"]
+    data['lista_lektur'] = card.section(
+        "Zalecana lista lektur", ["Adresy eZasobów", "Data wygenerowania"]
     )
 
-    data['przykladowe_zagadnienia'] = extract_section(
-        text, "Przykładowe zagadnienia", ["Praktyki zawodowe", "Dokument wygenerowany"]
+    data['przykladowe_zagadnienia'] = card.section(
+        "Przykładowe zagadnienia", ["Praktyki zawodowe", "Dokument wygenerowany"]
     )
 
     data['przykladowe_zagadnienia'] = data['przykladowe_zagadnienia'].replace('\n', ' ')
@@ -130,29 +271,129 @@ def save_as_json(data, out_path):
     with open(out_path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=4, ensure_ascii=False)
 
-def process_pdfs_in_folder(folder_path):
+class JsonSink:
+    """
+    Zapis rekordów na bieżąco: NDJSON (linia na rekord) albo tablica JSON identyczna
+    z json.dump(..., indent=4), pisana do pliku tymczasowego i podmieniana na końcu.
+    """
+
+    def __init__(self, out_path, output_format="json"):
+        if output_format not in ("json", "ndjson"):
+            raise ValueError(f"Nieznany format wyjścia: {output_format}")
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        self.out_path = out_path
+        self.output_format = output_format
+        self.written = 0
+        self._tmp = out_path.with_name(out_path.name + ".tmp")
+        self._file = open(self._tmp, "w", encoding="utf-8")
+
+    def write(self, record):
+        if self.output_format == "ndjson":
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            body = json.dumps(record, indent=4, ensure_ascii=False).replace("\n", "\n    ")
+            self._file.write(("[\n" if self.written == 0 else ",\n") + "    " + body)
+        self.written += 1
+
+    def close(self):
+        if self.output_format == "json":
+            self._file.write("\n]" if self.written else "[]")
+        self._file.close()
+        os.replace(self._tmp, self.out_path)
+
+def process_pdf(pdf_path, text=None):
+    """
+    Przetwarza jedną kartę; ``text`` to tekst z pamięci podręcznej (wtedy PDF nie jest otwierany).
+    Zwraca (nazwa pliku, dane albo None, błąd albo None, czasy w sekundach, nowo wyciągnięty tekst albo None).
+    """
+    start = time.perf_counter()
+    timings = {}
+    extracted = None
+    try:
+        if text is None:
+            text = extracted = extract_text_from_pdf(pdf_path)
+        timings["ekstrakcja"] = time.perf_counter() - start
+        parsed_data = parse_course_info(text)
+        timings["parsowanie"] = time.perf_counter() - start - timings["ekstrakcja"]
+        parsed_data["plik"] = Path(pdf_path).name  # opcjonalnie: dodaj nazwę pliku do danych
+        return Path(pdf_path).name, parsed_data, None, timings, extracted
+    except Exception as e:
+        timings["calosc"] = time.perf_counter() - start
+        return Path(pdf_path).name, None, f"{type(e).__name__}: {e}", timings, extracted
+
+def submit_in_order(pool, pdf_files, lookup, window):
+    """
+    Zleca karty puli po kolei, najwyżej ``window`` naraz, i zwraca wyniki w kolejności plików.
+    Tekst z pamięci podręcznej (``lookup``) jest pobierany tuż przed zleceniem danej karty.
+    """
+    pending = deque()
+    for pdf_path in pdf_files:
+        pending.append(pool.submit(process_pdf, pdf_path, lookup(pdf_path)))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def process_pdfs_in_folder(folder_path, workers=None, output_format="json", window=None, use_cache=True):
+    """
+    Przetwarza wszystkie karty z folderu w puli procesów (``workers=1`` - w bieżącym procesie).
+    Wyniki trafiają do pliku na bieżąco, w kolejności plików; błędy i czasy każdego pliku
+    zapisywane są w raporcie obok. Z ``use_cache`` tekst niezmienionych kart pochodzi
+    z ``.teksty_kart.sqlite`` w folderze kart, więc PyMuPDF otwiera tylko nowe i zmienione pliki.
+    Do puli trafia naraz najwyżej ``window`` kart (domyślnie 4 na proces).
+    """
     folder = Path(folder_path)
-    pdf_files = list(folder.glob("*.pdf"))
+    pdf_files = sorted(folder.glob("*.pdf"))
+
+    cache = TextCache(str(folder / ".teksty_kart.sqlite")) if use_cache else None
+    if cache:
+        evicted = cache.evict(p.name for p in pdf_files)
+        if evicted:
+            print(f"Usunięto z pamięci podręcznej {evicted} nieistniejących kart")
+        lookup = cache.get
+    else:
+        lookup = lambda pdf_path: None  # noqa: E731
+    stale = any(not cache.is_current(p) for p in pdf_files) if cache else bool(pdf_files)
 
     output_folder = folder.parent / "json_karty"
     output_folder.mkdir(exist_ok=True)
 
-    all_data = []  # lista na wszystkie wyniki
-
-    for pdf_file in pdf_files:
-        try:
-            text = extract_text_from_pdf(pdf_file)
-            parsed_data = parse_course_info(text)
-            parsed_data["plik"] = pdf_file.name  # opcjonalnie: dodaj nazwę pliku do danych
-            all_data.append(parsed_data)
-            print(f"Przetworzono: {pdf_file.name}")
-        except Exception as e:
-            print(f"Błąd przy {pdf_file.name}: {e}")
-
-    # Zapisz wszystkie dane do jednego JSON-a
-    output_file = output_folder / "wszystkie_karty.json"
-    save_as_json(all_data, output_file)
-    print(f"Zapisano zbiorczy plik: {output_file.name}")
+    output_file = output_folder / f"wszystkie_karty.{output_format}"
+    sink = JsonSink(output_file, output_format)
+    report = []
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+
+    # Same trafienia w pamięci podręcznej parsują się szybciej, niż startuje pula procesów.
+    if workers == 1 or not stale:
+        results = (process_pdf(pdf_path, lookup(pdf_path)) for pdf_path in pdf_files)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = submit_in_order(pool, pdf_files, lookup, window or workers * 4)
+
+    try:
+        for pdf_path, (name, parsed_data, error, timings, extracted) in zip(pdf_files, results):
+            if cache and extracted is not None:
+                cache.put(pdf_path, extracted)
+            if error:
+                print(f"Błąd przy {name}: {error}")
+            else:
+                sink.write(parsed_data)
+                print(f"Przetworzono: {name}")
+            report.append({"plik": name, "blad": error, **{k: round(v, 4) for k, v in timings.items()}})
+    finally:
+        if pool:
+            pool.shutdown()
+        if cache:
+            cache.close()
+        sink.close()
+
+    save_as_json(report, output_folder / "raport_przetwarzania.json")
+    elapsed = time.perf_counter() - start
+    errors = sum(1 for entry in report if entry["blad"])
+    print(f"Zapisano zbiorczy plik: {output_file.name} ({sink.written} kart, {errors} błędów, "
+          f"{elapsed:.1f} s, {workers} procesów, {cache.hits if cache else 0} tekstów z pamięci podręcznej)")
 
 
 
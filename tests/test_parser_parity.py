@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+pytest.importorskip("lxml")
+
+from benchmark import load_offer_fixtures  # noqa: E402
+from details_extractor import parse_job_details  # noqa: E402
+
+OFFERS = load_offer_fixtures(ROOT / "benchmarks" / "fixtures")
+
+
+def test_fixtures_present():
+    assert OFFERS
+
+
+@pytest.mark.parametrize("name,html,job_meta", OFFERS, ids=[name for name, _, _ in OFFERS])
+def test_lxml_matches_bs4(name, html, job_meta):
+    assert parse_job_details(html, job_meta, parser="lxml") == parse_job_details(html, job_meta, parser="bs4")
+
+
+def test_empty_page():
+    job_meta = {"link": "https://archiwum.pracuj.pl/praca/przyklad,oferta,1", "title": "T", "company": "C"}
+    assert parse_job_details("", job_meta, parser="lxml") == parse_job_details("", job_meta, parser="bs4")